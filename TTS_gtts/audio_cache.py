@@ -0,0 +1,182 @@
+import filecmp
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from TTS_gtts import audio_files
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+
+class AudioCache:
+    MANIFEST_NAME = "manifest.json"
+    # Unreferenced files younger than this may belong to another process that has not saved its manifest yet
+    ORPHAN_GRACE_SECONDS = 3600
+
+    def __init__(self, cache_dir: str, max_size_bytes: int = None, max_age_days: float = None):
+        """
+        Content-addressed store for synthesized audio files.
+        :param cache_dir: Directory holding the cached audio files and the manifest
+        :param max_size_bytes: Evict least recently used entries above this total size (None = unbounded)
+        :param max_age_days: Evict entries not accessed for this many days (None = never)
+        """
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.max_age_days = max_age_days
+        self.manifest_path = os.path.join(cache_dir, self.MANIFEST_NAME)
+        os.makedirs(cache_dir, exist_ok=True)
+        self.entries = self._load_manifest()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(text: str, lang: str, engine: str, voice_settings: dict = None) -> str:
+        """
+        Builds the cache key of a paragraph rendering.
+        :param text: The cleaned text sent to the TTS engine
+        :param lang: The language of the TTS
+        :param engine: Name of the TTS engine
+        :param voice_settings: Any engine option that changes the produced audio
+        :return: A hex sha256 digest
+        """
+        payload = json.dumps(
+            {"text": text, "lang": lang, "engine": engine, "voice": voice_settings or {}},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _load_manifest(self):
+        """Load the manifest, dropping entries whose audio file disappeared."""
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as file:
+                entries = json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable cache manifest {self.manifest_path}, starting empty: {e}")
+            return {}
+        return {
+            key: entry for key, entry in entries.items()
+            if os.path.exists(os.path.join(self.cache_dir, entry["file"]))
+        }
+
+    def save(self):
+        """
+        Write the manifest to disk, merged with the entries saved meanwhile by other processes
+        sharing the cache directory (the most recent access wins).
+        """
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with self.lock:
+            for key, entry in self._load_manifest().items():
+                current = self.entries.get(key)
+                if current is None or entry["last_access"] > current["last_access"]:
+                    self.entries[key] = entry
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(self.entries, file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def get(self, key: str):
+        """
+        Looks up a cached audio file.
+        :param key: Key built with make_key
+        :return: Path of the cached file, or None on a miss
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            path = os.path.join(self.cache_dir, entry["file"])
+            if not os.path.exists(path):
+                del self.entries[key]
+                self.misses += 1
+                return None
+            entry["last_access"] = time.time()
+            self.hits += 1
+            return path
+
+    def put(self, key: str, source_path: str, extension: str = ".mp3") -> str:
+        """
+        Stores a freshly synthesized file in the cache.
+        :param key: Key built with make_key
+        :param source_path: The audio file to copy into the cache
+        :param extension: File extension of the cached copy
+        :return: Path of the cached file
+        """
+        file_name = f"{key}{extension}"
+        path = os.path.join(self.cache_dir, file_name)
+        audio_files.copy_atomic(source_path, path)
+        now = time.time()
+        with self.lock:
+            self.entries[key] = {
+                "file": file_name,
+                "size": os.path.getsize(path),
+                "created_at": now,
+                "last_access": now,
+            }
+        return path
+
+    def materialize(self, key: str, dest_path: str) -> bool:
+        """
+        Copies a cached file to its output location, leaving identical files untouched.
+        :param key: Key built with make_key
+        :param dest_path: Where the audio file is expected
+        :return: True if the file was served from the cache
+        """
+        path = self.get(key)
+        if path is None:
+            return False
+        if os.path.exists(dest_path) and filecmp.cmp(path, dest_path, shallow=False):
+            return True
+        audio_files.copy_atomic(path, dest_path)
+        return True
+
+    def garbage_collect(self) -> int:
+        """
+        Evicts entries older than max_age_days, then least recently used ones above max_size_bytes.
+        :return: Number of evicted entries
+        """
+        evicted = []
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * 86400
+            evicted += [key for key, entry in self.entries.items() if entry["last_access"] < cutoff]
+        if self.max_size_bytes is not None:
+            remaining = sorted(
+                (item for item in self.entries.items() if item[0] not in evicted),
+                key=lambda item: item[1]["last_access"],
+            )
+            total = sum(entry["size"] for _, entry in remaining)
+            for key, entry in remaining:
+                if total <= self.max_size_bytes:
+                    break
+                evicted.append(key)
+                total -= entry["size"]
+
+        for key in evicted:
+            entry = self.entries.pop(key)
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except FileNotFoundError:
+                pass
+
+        # Remove audio files no longer referenced by the manifest
+        referenced = {entry["file"] for entry in self.entries.values()}
+        orphan_cutoff = time.time() - self.ORPHAN_GRACE_SECONDS
+        for file_name in os.listdir(self.cache_dir):
+            if file_name == self.MANIFEST_NAME or file_name in referenced:
+                continue
+            path = os.path.join(self.cache_dir, file_name)
+            try:
+                if os.path.getmtime(path) < orphan_cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} entries from the audio cache.")
+        return len(evicted)
@@ -0,0 +1,235 @@
+import logging
+import os
+import re
+import shutil
+import uuid
+import wave
+from contextlib import contextmanager
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+# Temporary files written next to their destination, see temp_path
+TEMP_FILE = re.compile(r'\.[0-9a-f]{8}\.tmp(\.\w+)?$')
+# Fastest plausible speech, audio shorter than the text at this rate is considered truncated
+MAX_CHARS_PER_SECOND = 40
+
+# MPEG audio frame header tables, indexed by the header bit fields
+MPEG_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+MPEG1_BITRATES = {
+    3: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),  # Layer I
+    2: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),  # Layer II
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),  # Layer III
+}
+MPEG2_BITRATES = {
+    3: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    1: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+
+def _id3v2_size(header: bytes) -> int:
+    """Total size of an ID3v2 tag from its 10-byte header, 0 if there is no tag."""
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def mp3_frame_range(path: str):
+    """
+    Byte range of the MPEG frames of an MP3 file, skipping ID3v2/ID3v1 tags.
+    :param path: The MP3 file
+    :return: (start, end) offsets
+    """
+    end = os.path.getsize(path)
+    with open(path, 'rb') as file:
+        start = _id3v2_size(file.read(10))
+        if end - start >= 128:
+            file.seek(end - 128)
+            if file.read(3) == b'TAG':
+                end -= 128
+    return start, end
+
+
+def _mp3_frame_header(header: bytes):
+    """
+    Decodes a 4-byte MPEG audio frame header.
+    :return: (frame length in bytes, samples in the frame, sample rate), or None if it is not a valid header
+    """
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    if version == 1 or layer == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None  # Reserved values, or a free-format stream
+    padding = (header[2] >> 1) & 0x01
+    sample_rate = MPEG_SAMPLE_RATES[version][rate_index]
+    bitrate = (MPEG1_BITRATES if version == 3 else MPEG2_BITRATES)[layer][bitrate_index] * 1000
+    if layer == 3:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    samples = 576 if layer == 1 and version != 3 else 1152
+    return samples // 8 * bitrate // sample_rate + padding, samples, sample_rate
+
+
+def mp3_frames(path: str):
+    """
+    Walks the frame headers of an MP3 file without decoding the audio.
+    :param path: The MP3 file
+    :return: (number of frames, duration in seconds, True if the last frame is cut short)
+    """
+    start, end = mp3_frame_range(path)
+    frames = 0
+    duration = 0.0
+    truncated = False
+    with open(path, 'rb') as file:
+        offset = start
+        while offset + 4 <= end:
+            file.seek(offset)
+            frame = _mp3_frame_header(file.read(4))
+            if frame is None:
+                offset += 1  # Resynchronize on the next frame header
+                continue
+            length, samples, sample_rate = frame
+            if offset + length > end:
+                truncated = True
+                break
+            frames += 1
+            duration += samples / sample_rate
+            offset += length
+    return frames, duration, truncated
+
+
+def mp3_duration(path: str) -> float:
+    """
+    Duration of an MP3 file, summed from its frame headers without decoding the audio.
+    :param path: The MP3 file
+    :return: Duration in seconds
+    """
+    return mp3_frames(path)[1]
+
+
+def wav_duration(path: str) -> float:
+    """Duration of a WAV file in seconds."""
+    with wave.open(path, 'rb') as file:
+        return file.getnframes() / file.getframerate()
+
+
+def audio_duration(path: str) -> float:
+    """Duration of an MP3 or WAV file in seconds, the extension selects the format."""
+    return wav_duration(path) if path.lower().endswith('.wav') else mp3_duration(path)
+
+
+def check_audio(path: str, text: str = None):
+    """
+    Sanity check of a synthesized file, raising ValueError when it is empty, cut short or too
+    short for its text. Reads the headers only.
+    :param path: The MP3 or WAV file
+    :param text: The text it should say
+    """
+    if os.path.getsize(path) == 0:
+        raise ValueError(f"Empty audio file {path}")
+    if path.lower().endswith('.wav'):
+        with wave.open(path, 'rb') as file:
+            expected = file.getnframes() * file.getsampwidth() * file.getnchannels()
+            duration = file.getnframes() / file.getframerate()
+        # The data chunk follows a header of at least 44 bytes
+        if os.path.getsize(path) - 44 < expected:
+            raise ValueError(f"Truncated WAV file {path}")
+    else:
+        frames, duration, truncated = mp3_frames(path)
+        if frames == 0 or truncated:
+            raise ValueError(f"Truncated MP3 file {path} ({frames} complete frames)")
+    if text and duration < len(text.strip()) / MAX_CHARS_PER_SECOND:
+        raise ValueError(f"Audio {path} lasts {duration:.1f}s, too short for {len(text)} characters")
+
+
+def temp_path(dest_path: str) -> str:
+    """Unique temporary path next to dest_path, keeping its extension so that the format is still detected."""
+    return f"{dest_path}.{uuid.uuid4().hex[:8]}.tmp{os.path.splitext(dest_path)[1]}"
+
+
+def commit(tmp_path: str, dest_path: str):
+    """Flush a temporary file to disk and move it over its destination in one step."""
+    with open(tmp_path, 'rb') as file:
+        os.fsync(file.fileno())
+    os.replace(tmp_path, dest_path)
+
+
+@contextmanager
+def atomic_output(dest_path: str):
+    """
+    Yields a temporary path to write instead of dest_path, renamed over it when the block succeeds
+    and removed when it fails, so that dest_path only ever holds complete files.
+    """
+    tmp_path = temp_path(dest_path)
+    try:
+        yield tmp_path
+        commit(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def copy_atomic(source_path: str, dest_path: str):
+    """Copy a file so that dest_path never exists half-written."""
+    with atomic_output(dest_path) as tmp_path:
+        shutil.copyfile(source_path, tmp_path)
+
+
+def _concat_mp3(part_paths, dest_path: str):
+    """Append the frames of every part, MPEG frames are independent so no re-encoding is needed."""
+    with open(dest_path, 'wb') as out:
+        for path in part_paths:
+            start, end = mp3_frame_range(path)
+            with open(path, 'rb') as part:
+                part.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    block = part.read(min(COPY_BUFFER_SIZE, remaining))
+                    if not block:
+                        break
+                    out.write(block)
+                    remaining -= len(block)
+
+
+def _concat_wav(part_paths, dest_path: str):
+    """Append the PCM frames of every part, all parts must share the same format."""
+    with wave.open(dest_path, 'wb') as out:
+        params = None
+        for path in part_paths:
+            with wave.open(path, 'rb') as part:
+                part_params = part.getparams()[:3]
+                if params is None:
+                    params = part_params
+                    out.setnchannels(params[0])
+                    out.setsampwidth(params[1])
+                    out.setframerate(params[2])
+                elif part_params != params:
+                    raise ValueError(f"Incompatible WAV format in {path}: {part_params} != {params}")
+                frames_per_block = max(1, COPY_BUFFER_SIZE // (params[0] * params[1]))
+                while True:
+                    frames = part.readframes(frames_per_block)
+                    if not frames:
+                        break
+                    out.writeframesraw(frames)
+
+
+def concat_audio(part_paths, dest_path: str):
+    """
+    Streams audio parts into one file without decoding them.
+    :param part_paths: Ordered list of MP3 or WAV files
+    :param dest_path: The resulting file, its extension selects the format
+    """
+    if len(part_paths) == 1:
+        shutil.copyfile(part_paths[0], dest_path)
+    elif dest_path.lower().endswith('.wav'):
+        _concat_wav(part_paths, dest_path)
+    else:
+        _concat_mp3(part_paths, dest_path)
+    logger.info(f"Concatenated {len(part_paths)} parts into {dest_path}")
@@ -0,0 +1,228 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# Coqui models loaded in this process, keyed by model name
+_MODELS = {}
+
+# Buffers larger than this are not kept for the next text, so that one long paragraph does not pin memory
+MAX_KEPT_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+class TTSBackend:
+    name = 'base'
+    extension = '.mp3'
+    supports_batch = False
+
+    def voice_settings(self) -> dict:
+        """Engine options that change the produced audio, part of the cache key."""
+        return {}
+
+    def synthesize(self, text: str, file_path: str):
+        """
+        Converts one text to an audio file, raising on failure.
+        :param text: The text to convert to speech
+        :param file_path: Where to write the audio file
+        """
+        raise NotImplementedError
+
+    def preferred_batch_size(self) -> int:
+        """Number of texts a synthesize_many call should get to keep the engine busy."""
+        return 1
+
+    def synthesize_many(self, items):
+        """
+        Converts several texts, one failure does not stop the others.
+        :param items: List of (text, file_path) tuples
+        :return: List of exceptions (None on success), aligned with items
+        """
+        errors = []
+        for text, file_path in items:
+            try:
+                self.synthesize(text, file_path)
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+        return errors
+
+    def close(self):
+        """Release the resources held between calls, e.g. worker processes. The backend stays usable."""
+
+
+class GTTSBackend(TTSBackend):
+    name = 'gtts'
+
+    def __init__(self, lang: str = 'fr', tld: str = 'com', slow: bool = False):
+        """
+        Google Translate TTS, one HTTP round-trip per text.
+        :param lang: The language of the TTS
+        :param tld: Top-level domain of the Google Translate host, changes the accent
+        :param slow: Read the text more slowly
+        """
+        self.lang = lang
+        self.tld = tld
+        self.slow = slow
+        self._local = threading.local()
+
+    def voice_settings(self) -> dict:
+        return {'lang': self.lang, 'tld': self.tld, 'slow': self.slow}
+
+    def _buffer(self) -> io.BytesIO:
+        """The in-memory buffer of the calling worker thread, emptied and reused for every text."""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None or buffer.getbuffer().nbytes > MAX_KEPT_BUFFER_SIZE:
+            buffer = self._local.buffer = io.BytesIO()
+        buffer.seek(0)
+        buffer.truncate()
+        return buffer
+
+    def synthesize(self, text: str, file_path: str):
+        from gtts import gTTS
+
+        tts = gTTS(text=text, lang=self.lang, tld=self.tld, slow=self.slow)
+        # Collect the streamed MP3 in memory so that nothing is written if the download fails midway
+        buffer = self._buffer()
+        tts.write_to_fp(buffer)
+        with open(file_path, 'wb') as file:
+            with buffer.getbuffer() as view:
+                file.write(view)
+
+
+def _load_coqui_model(model_name: str):
+    """Load a Coqui model on CPU once per process."""
+    model = _MODELS.get(model_name)
+    if model is None:
+        from TTS.api import TTS
+
+        logger.info(f"Loading Coqui model {model_name} in process {os.getpid()}")
+        model = TTS(model_name).to('cpu')
+        _MODELS[model_name] = model
+    return model
+
+
+def _init_coqui_worker(model_name: str, torch_threads: int):
+    """Process pool initializer: pin torch threads and load the model before the first batch."""
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    _load_coqui_model(model_name)
+
+
+def _synthesize_coqui_batch(model_name: str, options: dict, items):
+    """Synthesize a batch with the process-wide model, returning one error (or None) per item."""
+    import torch
+
+    model = _load_coqui_model(model_name)
+    if not getattr(model, 'is_multi_lingual', False):
+        # Single-language models reject the language argument
+        options = {name: value for name, value in options.items() if name != 'language'}
+    errors = []
+    with torch.inference_mode():
+        for text, file_path in items:
+            try:
+                model.tts_to_file(text=text, file_path=file_path, **options)
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+    return errors
+
+
+class CoquiBackend(TTSBackend):
+    name = 'coqui'
+    extension = '.wav'
+    supports_batch = True
+
+    def __init__(self, model_name: str = 'tts_models/multilingual/multi-dataset/xtts_v2', lang: str = 'fr',
+                 speaker: str = None, speaker_wav: str = None, batch_size: int = 16, num_processes: int = 0):
+        """
+        Local Coqui TTS on CPU, the model is loaded once per process. The worker processes are kept
+        until close(), so that they load the model once per run rather than once per call.
+        :param model_name: Coqui model identifier
+        :param lang: The language of the TTS, ignored by single-language models
+        :param speaker: Built-in speaker name (for multi-speaker models)
+        :param speaker_wav: Reference recording for voice cloning models such as XTTS
+        :param batch_size: Number of paragraphs handed to a worker per synthesis call
+        :param num_processes: Size of the process pool, 0 runs in-process, None uses every CPU core
+        """
+        self.model_name = model_name
+        self.lang = lang
+        self.speaker = speaker
+        self.speaker_wav = speaker_wav
+        self.batch_size = batch_size
+        self.num_processes = os.cpu_count() if num_processes is None else num_processes
+        self._executor = None
+
+    def voice_settings(self) -> dict:
+        return {'model': self.model_name, 'lang': self.lang, 'speaker': self.speaker,
+                'speaker_wav': self.speaker_wav}
+
+    def _options(self) -> dict:
+        """Keyword arguments of TTS.tts_to_file for this voice."""
+        options = {}
+        if self.lang:
+            options['language'] = self.lang
+        if self.speaker:
+            options['speaker'] = self.speaker
+        if self.speaker_wav:
+            options['speaker_wav'] = self.speaker_wav
+        return options
+
+    def synthesize(self, text: str, file_path: str):
+        error = _synthesize_coqui_batch(self.model_name, self._options(), [(text, file_path)])[0]
+        if error is not None:
+            raise error
+
+    def preferred_batch_size(self) -> int:
+        # One batch for every worker process
+        return self.batch_size * max(1, self.num_processes)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """The process pool of this backend, started on first use."""
+        if self._executor is None:
+            torch_threads = max(1, (os.cpu_count() or 1) // self.num_processes)
+            logger.info(f"Starting {self.num_processes} Coqui worker processes")
+            self._executor = ProcessPoolExecutor(max_workers=self.num_processes, initializer=_init_coqui_worker,
+                                                 initargs=(self.model_name, torch_threads))
+        return self._executor
+
+    def synthesize_many(self, items):
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+        if self.num_processes <= 1:
+            errors = []
+            for batch in batches:
+                errors += _synthesize_coqui_batch(self.model_name, self._options(), batch)
+            return errors
+
+        logger.info(f"Sharding {len(items)} paragraphs in {len(batches)} batches over {self.num_processes} processes")
+        executor = self._get_executor()
+        futures = [executor.submit(_synthesize_coqui_batch, self.model_name, self._options(), batch)
+                   for batch in batches]
+        errors = []
+        for future in futures:
+            errors += future.result()
+        return errors
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def create_backend(name: str = 'gtts', lang: str = 'fr', **options) -> TTSBackend:
+    """
+    Builds a backend from its configuration.
+    :param name: 'gtts' or 'coqui'
+    :param lang: The language of the TTS
+    :param options: Backend specific keyword arguments
+    :return: A TTSBackend instance
+    """
+    if name == 'gtts':
+        return GTTSBackend(lang=lang, **options)
+    if name == 'coqui':
+        return CoquiBackend(lang=lang, **options)
+    raise ValueError(f"Unknown TTS backend: {name}")
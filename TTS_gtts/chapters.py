@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import shutil
+import subprocess
+from TTS_gtts import audio_files
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+INDEX_EXTENSION = '.json'
+
+
+def chapter_path(chapters_dir: str, note_name: str, extension: str) -> str:
+    """Path of the chapter file of a note, 'Partie 1 - La traversée.md' gives 'Partie 1 - La traversée.mp3'."""
+    return os.path.join(chapters_dir, f"{os.path.splitext(note_name)[0]}{extension}")
+
+
+def read_index(path: str):
+    """Load a chapter index, None if it is missing or unreadable."""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def build_index(note_name: str, paragraphs):
+    """
+    Computes the position of every paragraph in the chapter.
+    :param note_name: The note
+    :param paragraphs: Ordered list of (paragrapge_order, audio file path)
+    :return: Index dict, paragraphs can be played from start_seconds for duration_seconds. MP3
+             chapters also get the byte range of each paragraph, usable for HTTP range requests.
+    """
+    entries = []
+    position = 0.0
+    byte_offset = 0
+    for order, path in paragraphs:
+        duration = audio_files.audio_duration(path)
+        entry = {'order': order, 'source': os.path.basename(path),
+                 'start_seconds': round(position, 3), 'duration_seconds': round(duration, 3)}
+        if not path.lower().endswith('.wav'):
+            start, end = audio_files.mp3_frame_range(path)
+            entry['byte_offset'] = byte_offset
+            entry['byte_length'] = end - start
+            byte_offset += end - start
+        entries.append(entry)
+        position += duration
+    return {'note_name': note_name, 'duration_seconds': round(position, 3), 'paragraphs': entries}
+
+
+def transcode_to_opus(source_path: str, dest_path: str, bitrate: str = '32k'):
+    """
+    Transcodes a chapter to Opus with ffmpeg, which streams the file instead of loading it.
+    :param source_path: The MP3 or WAV chapter
+    :param dest_path: The .opus file to write
+    :param bitrate: Target bitrate in ffmpeg notation, e.g. '32k' (speech stays clear down to ~24k)
+    """
+    tmp_path = f"{dest_path}.tmp"
+    subprocess.run(
+        ['ffmpeg', '-y', '-loglevel', 'error', '-i', source_path,
+         '-c:a', 'libopus', '-b:a', str(bitrate), '-application', 'voip', '-f', 'opus', tmp_path],
+        check=True
+    )
+    os.replace(tmp_path, dest_path)
+
+
+def assemble_chapter(note_name: str, paragraphs, chapters_dir: str, version: str = None,
+                     opus_bitrate: str = None, force: bool = False) -> bool:
+    """
+    Concatenates the paragraph files of a note into one chapter file with a JSON offset index next to it.
+    :param note_name: The note
+    :param paragraphs: Ordered list of (paragrapge_order, audio file path), all in the same format
+    :param chapters_dir: Directory of the chapter files
+    :param version: Identifies the paragraph audio (e.g. a hash of the rendered paragraph hashes), the
+                    chapter is left alone when its index records the same version
+    :param opus_bitrate: Transcode the chapter to Opus at this bitrate and drop the concatenated file
+    :param force: Rebuild the chapter even if its version did not change
+    :return: True if the chapter was (re)assembled
+    """
+    if not paragraphs:
+        logger.warning(f"No paragraph audio for {note_name}, no chapter assembled.")
+        return False
+    os.makedirs(chapters_dir, exist_ok=True)
+    extension = os.path.splitext(paragraphs[0][1])[1]
+    chapter_extension = '.opus' if opus_bitrate else extension
+    index_path = chapter_path(chapters_dir, note_name, INDEX_EXTENSION)
+    dest_path = chapter_path(chapters_dir, note_name, chapter_extension)
+
+    previous = read_index(index_path)
+    if (not force and version is not None and previous and previous.get('version') == version
+            and previous.get('opus_bitrate') == opus_bitrate and os.path.exists(dest_path)):
+        logger.info(f"Chapter {dest_path} is up to date.")
+        return False
+
+    index = build_index(note_name, paragraphs)
+    concat_path = chapter_path(chapters_dir, note_name, extension)
+    tmp_path = f"{concat_path}.tmp{extension}"
+    try:
+        audio_files.concat_audio([path for _, path in paragraphs], tmp_path)
+        if opus_bitrate:
+            if shutil.which('ffmpeg') is None:
+                raise RuntimeError("ffmpeg is required to transcode chapters to Opus")
+            transcode_to_opus(tmp_path, dest_path, opus_bitrate)
+            # Byte offsets refer to the concatenated stream, Opus pages do not keep them
+            for entry in index['paragraphs']:
+                entry.pop('byte_offset', None)
+                entry.pop('byte_length', None)
+            if os.path.exists(concat_path):
+                os.remove(concat_path)  # Left by a run without transcoding
+        else:
+            os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    index.update({'file': os.path.basename(dest_path), 'version': version, 'opus_bitrate': opus_bitrate})
+    tmp_index_path = f"{index_path}.tmp"
+    with open(tmp_index_path, 'w', encoding='utf-8') as file:
+        json.dump(index, file, ensure_ascii=False, indent=2)
+    os.replace(tmp_index_path, index_path)
+    logger.info(f"Assembled chapter {dest_path} from {len(paragraphs)} paragraphs ({index['duration_seconds']}s).")
+    return True
@@ -0,0 +1,73 @@
+import re
+
+# A sentence ends with . ! ? or … (optionally followed by closing quotes, French » after a space) and whitespace
+SENTENCE_END = re.compile(r'[.!?…]+(?:\s*»|["”)])*\s+')
+# Fallback split points inside an overlong sentence
+CLAUSE_END = re.compile(r'(?<=[,;:])\s+')
+
+
+def split_sentences(text: str):
+    """
+    Splits a paragraph into sentences, keeping the punctuation and closing quotes.
+    :param text: The paragraph text
+    :return: List of non-empty sentences
+    """
+    sentences = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        sentences.append(text[start:match.end()].strip())
+        start = match.end()
+    sentences.append(text[start:].strip())
+    return [sentence for sentence in sentences if sentence]
+
+
+def _split_long(sentence: str, max_chars: int):
+    """Break a sentence longer than max_chars at clause boundaries, then at spaces."""
+    pieces = []
+    for clause in CLAUSE_END.split(sentence):
+        while len(clause) > max_chars:
+            cut = clause.rfind(' ', 0, max_chars + 1)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(clause[:cut].strip())
+            clause = clause[cut:].strip()
+        if clause:
+            pieces.append(clause)
+    return _pack(pieces, max_chars)
+
+
+def _pack(pieces, max_chars: int):
+    """Greedily join consecutive pieces while the result stays within max_chars."""
+    chunks = []
+    current = ''
+    for piece in pieces:
+        candidate = f"{current} {piece}" if current else piece
+        if len(candidate) <= max_chars:
+            current = candidate
+        else:
+            if current:
+                chunks.append(current)
+            current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_into_chunks(text: str, max_chars: int = 400):
+    """
+    Splits a paragraph at sentence boundaries into chunks of at most max_chars characters.
+    Sentences longer than max_chars are split at commas/semicolons, then at spaces.
+    :param text: The paragraph text
+    :param max_chars: Maximum chunk length
+    :return: List of chunks, a single chunk when the paragraph already fits
+    """
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+    pieces = []
+    for sentence in split_sentences(text):
+        if len(sentence) > max_chars:
+            pieces += _split_long(sentence, max_chars)
+        else:
+            pieces.append(sentence)
+    return _pack(pieces, max_chars)
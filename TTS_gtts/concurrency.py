@@ -0,0 +1,77 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+TaskResult = namedtuple("TaskResult", ["index", "item", "ok", "value", "error", "attempts"])
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        Thread-safe token bucket limiting how often a remote engine is called.
+        :param rate: Tokens added per second
+        :param capacity: Maximum burst size, defaults to one second worth of tokens
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and consume it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def _run_with_retry(func, index, item, rate_limiter, max_retries, backoff_seconds):
+    """Call func(item), retrying with exponential backoff on failure."""
+    attempt = 0
+    while True:
+        attempt += 1
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            return TaskResult(index, item, True, func(item), None, attempt)
+        except Exception as e:
+            if attempt > max_retries:
+                return TaskResult(index, item, False, None, e, attempt)
+            delay = backoff_seconds * (2 ** (attempt - 1))
+            logger.warning(f"Attempt {attempt} failed for item {index}: {e}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def map_concurrently(func, items, max_workers: int = 4, rate_limiter: TokenBucket = None,
+                     max_retries: int = 0, backoff_seconds: float = 1.0):
+    """
+    Applies func to every item on a bounded thread pool.
+    :param func: Callable taking one item, exceptions mark the item as failed
+    :param items: Iterable of work items
+    :param max_workers: Number of concurrent calls
+    :param rate_limiter: Optional TokenBucket shared by all workers
+    :param max_retries: Extra attempts per item after a failure
+    :param backoff_seconds: Delay before the first retry, doubled on each attempt
+    :return: Generator of TaskResult, yielded in input order
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [
+            executor.submit(_run_with_retry, func, index, item, rate_limiter, max_retries, backoff_seconds)
+            for index, item in enumerate(items)
+        ]
+        for future in futures:
+            yield future.result()
@@ -0,0 +1,115 @@
+import functools
+import logging
+import os
+import re
+
+import yaml
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(__file__), 'lexicon.yaml')
+
+# Markdown that survives cleaned_paragraphes.sql, applied one after the other (so that the emphasis inside
+# a link is still removed) before the lexicon sees the text
+MARKDOWN_RULES = [
+    (r'!\[[^\]]*\]\([^)]*\)', ''),  # Images
+    (r'\[\[(?:[^\]|]*\|)?([^\]]+)\]\]', r'\1'),  # Obsidian [[note]] and [[note|alias]] links
+    (r'\[\^[^\]]+\]', ''),  # Footnote references
+    (r'\[([^\]]+)\]\([^)]*\)', r'\1'),  # [text](url) links
+    (r'^#{1,6}\s+', ''),  # Headings
+    (r'^\s*[-+]\s+', ''),  # List items and dialogue dashes
+    (r'^>\s*', ''),  # Quotes
+    (r'`([^`]*)`', r'\1'),  # Inline code
+    (r'<[^>]+>', ''),  # HTML tags
+    (r'\*+|==', ''),  # Bold, italic and highlight markers
+]
+
+MULTIPLE_SPACES = re.compile(r' {2,}')
+# Group references in a pattern or replacement template, escaped backslashes are matched first to skip them
+GROUP_REFERENCE = re.compile(r'\\\\|\\g<(\d+)>|\\(\d+)')
+
+
+def _shift_groups(text: str, offset: int, in_pattern: bool = False) -> str:
+    """
+    Renumber the group references of a rule once it is embedded after offset groups of the combined pattern.
+    :param text: A pattern (backreferences) or a replacement template
+    :param in_pattern: Write pattern backreferences instead of template references
+    """
+    def shift(match):
+        number = match.group(1) or match.group(2)
+        if number is None:
+            return match.group(0)
+        return f"(?:\\{int(number) + offset})" if in_pattern else f"\\g<{int(number) + offset}>"
+    return GROUP_REFERENCE.sub(shift, text)
+
+
+class TextNormalizer:
+    def __init__(self, rules=(), words=None, strip_markdown: bool = True, ignore_case_words: bool = False,
+                 cache_size: int = 4096):
+        """
+        Rewrites paragraphs before synthesis. Markdown is stripped first, then the regex rules and
+        whole-word pronunciations are compiled into one pattern so that the lexicon scans a paragraph once.
+        :param rules: List of (pattern, replacement), the first one wins where several match, replacements may use \\1
+        :param words: Dict of word -> spoken form, matched on whole words
+        :param strip_markdown: Also remove the Markdown listed in MARKDOWN_RULES
+        :param ignore_case_words: Match the words whatever their case
+        :param cache_size: Number of normalized paragraphs memoized
+        """
+        self.words = dict(words or {})
+        self.ignore_case_words = ignore_case_words
+        self._lookup = {word.casefold() if ignore_case_words else word: spoken for word, spoken in self.words.items()}
+
+        self.markdown_rules = [(re.compile(pattern, re.MULTILINE), replacement)
+                               for pattern, replacement in MARKDOWN_RULES] if strip_markdown else []
+        alternatives = []
+        self._templates = {}
+        group_count = 0
+        for index, (pattern, replacement) in enumerate(rules):
+            name = f"rule{index}"
+            try:
+                inner_groups = re.compile(pattern).groups
+            except re.error as e:
+                raise ValueError(f"Invalid lexicon pattern {pattern!r}: {e}") from e
+            # The rule's own groups follow its enclosing named group
+            alternatives.append(f"(?P<{name}>{_shift_groups(pattern, group_count + 1, in_pattern=True)})")
+            self._templates[name] = _shift_groups(replacement, group_count + 1)
+            group_count += 1 + inner_groups
+        if self.words:
+            # Longest first so that 'Gamélia' wins over 'Gamé'
+            words_pattern = "|".join(re.escape(word) for word in sorted(self.words, key=len, reverse=True))
+            flags = "(?i:" if ignore_case_words else "(?:"
+            alternatives.append(f"(?P<word>\\b{flags}{words_pattern})\\b)")
+        self.pattern = re.compile("|".join(alternatives), re.MULTILINE) if alternatives else None
+        self.normalize = functools.lru_cache(maxsize=cache_size)(self._normalize)
+
+    @classmethod
+    def from_file(cls, path: str, cache_size: int = 4096):
+        """
+        Loads a lexicon file, see TTS_gtts/lexicon.yaml for the format.
+        :param path: YAML lexicon
+        :param cache_size: Number of normalized paragraphs memoized
+        """
+        with open(path, 'r', encoding='utf-8') as file:
+            lexicon = yaml.safe_load(file) or {}
+        rules = [(rule['pattern'], rule.get('replacement', '')) for rule in lexicon.get('rules') or []]
+        normalizer = cls(rules=rules, words=lexicon.get('words') or {},
+                         strip_markdown=lexicon.get('strip_markdown', True),
+                         ignore_case_words=lexicon.get('ignore_case_words', False), cache_size=cache_size)
+        logger.info(f"Loaded lexicon {path}: {len(rules)} rules, {len(normalizer.words)} words.")
+        return normalizer
+
+    def _replace(self, match) -> str:
+        if match.lastgroup == "word":
+            word = match.group()
+            return self._lookup[word.casefold() if self.ignore_case_words else word]
+        return match.expand(self._templates[match.lastgroup])
+
+    def _normalize(self, text: str) -> str:
+        if self.pattern is None and not self.markdown_rules:
+            return text
+        for pattern, replacement in self.markdown_rules:
+            text = pattern.sub(replacement, text)
+        if self.pattern is not None:
+            text = self.pattern.sub(self._replace, text)
+        return MULTIPLE_SPACES.sub(' ', text).strip()
@@ -0,0 +1,131 @@
+import difflib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+
+def paragraph_hash(text: str) -> str:
+    """Stable identity of a paragraph: the sha256 of its cleaned text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ParagraphDiff:
+    def __init__(self):
+        """
+        Changes between two versions of a note. Orders are 1-based paragraph positions.
+        added/changed: new orders to synthesize
+        moved: (old_order, new_order) pairs whose audio can be renamed
+        deleted: old orders whose audio is no longer needed
+        unchanged: orders whose audio is still valid in place
+        """
+        self.added = []
+        self.changed = []
+        self.moved = []
+        self.deleted = []
+        self.unchanged = []
+
+    def to_render(self):
+        """New orders that need synthesis."""
+        return sorted(self.added + self.changed)
+
+    def __repr__(self):
+        return (f"ParagraphDiff(added={len(self.added)}, changed={len(self.changed)}, moved={len(self.moved)}, "
+                f"deleted={len(self.deleted)}, unchanged={len(self.unchanged)})")
+
+
+def diff_paragraphs(previous_hashes, current_hashes) -> ParagraphDiff:
+    """
+    Aligns two versions of a note paragraph by paragraph.
+    :param previous_hashes: Paragraph hashes of the rendered version, in order (None for unrendered paragraphs)
+    :param current_hashes: Paragraph hashes of the new version, in order
+    :return: A ParagraphDiff
+    """
+    diff = ParagraphDiff()
+    removed = []  # old orders that disappeared from their aligned position
+    inserted = []  # new orders that appeared at an unaligned position
+
+    matcher = difflib.SequenceMatcher(None, previous_hashes, current_hashes, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            for offset in range(i2 - i1):
+                old_order, new_order = i1 + offset + 1, j1 + offset + 1
+                if previous_hashes[i1 + offset] is None:
+                    diff.changed.append(new_order)
+                elif old_order == new_order:
+                    diff.unchanged.append(new_order)
+                else:
+                    diff.moved.append((old_order, new_order))
+        elif tag == "replace":
+            # Paragraphs edited in place pair up, the surplus is an insertion or a removal
+            paired = min(i2 - i1, j2 - j1)
+            diff.changed += [j1 + offset + 1 for offset in range(paired)]
+            removed += [i1 + offset + 1 for offset in range(paired, i2 - i1)]
+            inserted += [j1 + offset + 1 for offset in range(paired, j2 - j1)]
+        elif tag == "delete":
+            removed += list(range(i1 + 1, i2 + 1))
+        elif tag == "insert":
+            inserted += list(range(j1 + 1, j2 + 1))
+
+    # A paragraph cut from one place and pasted elsewhere shows up as a removal plus an insertion
+    removed_by_hash = {}
+    for old_order in removed:
+        removed_by_hash.setdefault(previous_hashes[old_order - 1], []).append(old_order)
+    for new_order in inserted:
+        candidates = removed_by_hash.get(current_hashes[new_order - 1])
+        if candidates:
+            old_order = candidates.pop(0)
+            if old_order == new_order:
+                diff.unchanged.append(new_order)
+            else:
+                diff.moved.append((old_order, new_order))
+        else:
+            diff.added.append(new_order)
+    diff.deleted = sorted(order for orders in removed_by_hash.values() for order in orders)
+    return diff
+
+
+class RenderState:
+    def __init__(self, path: str):
+        """
+        Paragraph hashes of the audio currently on disk, per note. Several processes can share the
+        file as long as they render different notes: each one only writes back the notes it set.
+        :param path: JSON file holding the state
+        """
+        self.path = path
+        self.notes = self._load()
+        self._changed = set()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable render state {self.path}, every paragraph will be rendered: {e}")
+            return {}
+
+    def get(self, note_name: str):
+        """Return the rendered paragraph hashes of a note, None if it was never rendered."""
+        return self.notes.get(note_name)
+
+    def set(self, note_name: str, hashes):
+        self.notes[note_name] = list(hashes)
+        self._changed.add(note_name)
+
+    def save(self):
+        """Write the notes set by this process to disk, merged with the notes saved meanwhile by other processes."""
+        with open(f"{self.path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)  # Released when the file is closed
+            notes = self._load()
+            notes.update({note_name: self.notes[note_name] for note_name in self._changed})
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(notes, file, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        self.notes = notes
@@ -0,0 +1,255 @@
+import logging
+import os
+import socket
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+QUEUE_TABLE = 'wizetts.tts_render_queue'
+
+PENDING = 'pending'
+IN_PROGRESS = 'in_progress'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def default_worker_id() -> str:
+    """Identifies the process holding a lease, e.g. 'macbook:4242'."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Owned by another user
+    return True
+
+
+class RenderQueue:
+    def __init__(self, postgres_client, lease_seconds: float = 900, max_attempts: int = 5,
+                 retry_backoff_seconds: float = 30.0):
+        """
+        Durable queue of paragraphs to render, shared by every worker process through PostgreSQL.
+        A job is claimed with a lease: if its worker dies, the job becomes claimable again once the
+        lease expires, or as soon as another worker of the same host notices (release_dead_leases),
+        so an interrupted run resumes where it stopped.
+        :param postgres_client: A postgres.PostgresClient
+        :param lease_seconds: How long a claimed job stays reserved for its worker
+        :param max_attempts: Claims of a job before it is marked failed
+        :param retry_backoff_seconds: Delay before a failed job can be claimed again, doubled on each attempt
+        """
+        self.postgres_client = postgres_client
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self._table_ready = False
+
+    def ensure_table(self):
+        """Create the queue table on first use."""
+        if self._table_ready:
+            return
+        with self.postgres_client.transaction():
+            self.postgres_client.execute_query(f"""
+            CREATE TABLE IF NOT EXISTS {QUEUE_TABLE} (
+                output_filename text PRIMARY KEY,
+                note_name text NOT NULL,
+                paragrapge_order integer NOT NULL,
+                content text NOT NULL,
+                paragraph_hash text NOT NULL,
+                status text NOT NULL default 'pending'
+                    CHECK (status IN ('pending', 'in_progress', 'done', 'failed')),
+                attempts integer NOT NULL default 0,
+                lease_owner text,
+                lease_expires_at timestamptz,
+                available_at timestamptz NOT NULL default NOW(),
+                last_error text,
+                updated_at timestamptz NOT NULL default NOW()
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_tts_render_queue_claim
+                ON {QUEUE_TABLE} (status, available_at, note_name, paragrapge_order);
+            """, fetch=False)
+        self._table_ready = True
+
+    def enqueue(self, jobs, reset_done: bool = False):
+        """
+        Adds paragraphs to render, or resets their job when the paragraph changed.
+        A job already done or in progress for the same paragraph text is left alone, so re-planning
+        after a crash does not render twice what was completed.
+        :param jobs: List of (note_name, paragrapge_order, content, paragraph_hash, output_filename)
+        :param reset_done: Also reset done jobs with the same text, e.g. when their audio file disappeared
+        :return: Number of jobs sent
+        """
+        self.ensure_table()
+        keep = f"q.status = '{IN_PROGRESS}'" if reset_done else f"q.status IN ('{DONE}', '{IN_PROGRESS}')"
+        with self.postgres_client.transaction():
+            return self.postgres_client.execute_many(f"""
+            INSERT INTO {QUEUE_TABLE} AS q (note_name, paragrapge_order, content, paragraph_hash, output_filename)
+            VALUES %s
+            ON CONFLICT (output_filename) DO UPDATE SET
+                note_name = EXCLUDED.note_name,
+                paragrapge_order = EXCLUDED.paragrapge_order,
+                content = EXCLUDED.content,
+                paragraph_hash = EXCLUDED.paragraph_hash,
+                status = '{PENDING}',
+                attempts = 0,
+                lease_owner = NULL,
+                lease_expires_at = NULL,
+                available_at = NOW(),
+                last_error = NULL,
+                updated_at = NOW()
+            WHERE NOT ({keep} AND q.paragraph_hash = EXCLUDED.paragraph_hash);
+            """, jobs)
+
+    def forget(self, output_filenames):
+        """
+        Drops the jobs of files replaced outside the queue (e.g. audio renamed over them), so that a job
+        done for the same text is not trusted any more.
+        """
+        if not output_filenames:
+            return
+        self.ensure_table()
+        with self.postgres_client.transaction():
+            self.postgres_client.execute_query(
+                f"DELETE FROM {QUEUE_TABLE} WHERE output_filename = ANY(%s);",
+                params=(list(output_filenames),), fetch=False
+            )
+
+    def release_dead_leases(self, worker_id: str):
+        """
+        Releases the leases held by processes of this host that are gone, e.g. the run that crashed
+        before this one, instead of waiting for the leases to expire. Leases recorded under worker_id
+        itself are released too, its pid may have been reused.
+        :param worker_id: A default_worker_id() of this host
+        :return: Number of jobs released
+        """
+        host, _, pid = worker_id.rpartition(':')
+        if not pid.isdigit():
+            return 0
+        self.ensure_table()
+        with self.postgres_client.transaction():
+            owners = self.postgres_client.execute_query(f"""
+            SELECT DISTINCT lease_owner FROM {QUEUE_TABLE}
+            WHERE status = '{IN_PROGRESS}' AND starts_with(lease_owner, %s);
+            """, params=(f"{host}:",)) or []
+            dead = []
+            for owner, in owners:
+                owner_pid = owner.rpartition(':')[2]
+                if owner == worker_id or (owner_pid.isdigit() and not _process_exists(int(owner_pid))):
+                    dead.append(owner)
+            if not dead:
+                return 0
+            rows = self.postgres_client.execute_query(f"""
+            UPDATE {QUEUE_TABLE}
+            SET status = CASE WHEN attempts >= %s THEN '{FAILED}' ELSE '{PENDING}' END,
+                available_at = NOW(),
+                lease_owner = NULL,
+                lease_expires_at = NULL,
+                last_error = 'worker died',
+                updated_at = NOW()
+            WHERE status = '{IN_PROGRESS}' AND lease_owner = ANY(%s)
+            RETURNING output_filename;
+            """, params=(self.max_attempts, dead)) or []
+        if rows:
+            logger.info(f"Released {len(rows)} jobs leased by dead workers {', '.join(dead)}.")
+        return len(rows)
+
+    def claim(self, worker_id: str, limit: int, note_names=None):
+        """
+        Reserves up to limit claimable jobs for a worker. Jobs locked by a concurrent claim are skipped
+        rather than waited for, jobs whose lease expired are taken over.
+        :param worker_id: Owner recorded on the lease
+        :param limit: Maximum number of jobs
+        :param note_names: Only claim jobs of these notes, any note by default
+        :return: List of (note_name, paragrapge_order, content, output_filename) in note order
+        """
+        self.ensure_table()
+        note_filter = "AND note_name = ANY(%(note_names)s)" if note_names is not None else ""
+        params = {'worker_id': worker_id, 'limit': limit, 'lease_seconds': self.lease_seconds,
+                  'max_attempts': self.max_attempts, 'note_names': list(note_names or [])}
+        with self.postgres_client.transaction():
+            # Jobs whose worker died on their last allowed attempt
+            self.postgres_client.execute_query(f"""
+            UPDATE {QUEUE_TABLE}
+            SET status = '{FAILED}', last_error = 'lease expired', lease_owner = NULL, updated_at = NOW()
+            WHERE status = '{IN_PROGRESS}' AND lease_expires_at < NOW() AND attempts >= %(max_attempts)s
+            {note_filter};
+            """, params=params, fetch=False)
+            rows = self.postgres_client.execute_query(f"""
+            WITH claimable AS (
+                SELECT output_filename
+                FROM {QUEUE_TABLE}
+                WHERE ((status = '{PENDING}' AND available_at <= NOW())
+                       OR (status = '{IN_PROGRESS}' AND lease_expires_at < NOW()))
+                {note_filter}
+                ORDER BY note_name, paragrapge_order
+                LIMIT %(limit)s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE {QUEUE_TABLE} AS q
+            SET status = '{IN_PROGRESS}',
+                attempts = q.attempts + 1,
+                lease_owner = %(worker_id)s,
+                lease_expires_at = NOW() + make_interval(secs => %(lease_seconds)s),
+                updated_at = NOW()
+            FROM claimable
+            WHERE q.output_filename = claimable.output_filename
+            RETURNING q.note_name, q.paragrapge_order, q.content, q.output_filename;
+            """, params=params)
+        return sorted(rows or [], key=lambda row: (row[0], row[1]))
+
+    def complete(self, worker_id: str, output_filenames):
+        """Mark jobs done, unless their lease was taken over by another worker meanwhile."""
+        if not output_filenames:
+            return
+        with self.postgres_client.transaction():
+            self.postgres_client.execute_query(f"""
+            UPDATE {QUEUE_TABLE}
+            SET status = '{DONE}', lease_owner = NULL, lease_expires_at = NULL, last_error = NULL, updated_at = NOW()
+            WHERE output_filename = ANY(%s) AND lease_owner = %s;
+            """, params=(list(output_filenames), worker_id), fetch=False)
+
+    def fail(self, worker_id: str, output_filenames, error: str):
+        """Release failed jobs for a later attempt with exponential backoff, or mark them failed for good."""
+        if not output_filenames:
+            return
+        with self.postgres_client.transaction():
+            self.postgres_client.execute_query(f"""
+            UPDATE {QUEUE_TABLE}
+            SET status = CASE WHEN attempts >= %s THEN '{FAILED}' ELSE '{PENDING}' END,
+                available_at = NOW() + make_interval(secs => %s * power(2, attempts - 1)),
+                lease_owner = NULL,
+                lease_expires_at = NULL,
+                last_error = %s,
+                updated_at = NOW()
+            WHERE output_filename = ANY(%s) AND lease_owner = %s;
+            """, params=(self.max_attempts, self.retry_backoff_seconds, error, list(output_filenames), worker_id),
+                fetch=False)
+
+    def statuses(self, output_filenames):
+        """
+        Looks up jobs.
+        :return: Dict of output_filename -> (status, paragraph_hash)
+        """
+        if not output_filenames:
+            return {}
+        with self.postgres_client.transaction():
+            rows = self.postgres_client.execute_query(
+                f"SELECT output_filename, status, paragraph_hash FROM {QUEUE_TABLE} WHERE output_filename = ANY(%s);",
+                params=(list(output_filenames),)
+            )
+        return {output_filename: (status, paragraph_hash) for output_filename, status, paragraph_hash in rows or []}
+
+    def count_in_progress(self, note_names=None) -> int:
+        """Number of jobs currently leased by a live worker."""
+        note_filter = "AND note_name = ANY(%s)" if note_names is not None else ""
+        params = (list(note_names),) if note_names is not None else None
+        with self.postgres_client.transaction():
+            rows = self.postgres_client.execute_query(f"""
+            SELECT COUNT(*) FROM {QUEUE_TABLE}
+            WHERE status = '{IN_PROGRESS}' AND lease_expires_at >= NOW() {note_filter};
+            """, params=params)
+        return rows[0][0] if rows else 0
@@ -1,8 +1,20 @@
+import hashlib
+import json
 import os
-from gtts import gTTS
-import psycopg2
-import pandas as pd
 import logging
+import re
+import time
+from metrics import pipeline_metrics
+from postgres import postgres
+from TTS_gtts import audio_cache
+from TTS_gtts import audio_files
+from TTS_gtts import backends
+from TTS_gtts import chapters
+from TTS_gtts import chunking
+from TTS_gtts import concurrency
+from TTS_gtts import normalization
+from TTS_gtts import paragraph_diff
+from TTS_gtts import render_queue
 
 # Setup logger
 logger = logging.getLogger(__name__)
@@ -13,20 +25,177 @@ formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 ch.setFormatter(formatter)
 logger.addHandler(ch)
 
+# Chunk files of a paragraph being synthesized, see _plan
+CHUNK_FILE = re.compile(r'\.part\d+\.\w+$')
+
 
 class TTSProcessor:
-    def __init__(self, db_params: dict, output_dir: str, lang: str = 'fr'):
+    # Delay between two checks of jobs leased by other workers
+    QUEUE_POLL_SECONDS = 5
+    # Temporary and chunk files older than this were left by a crashed worker
+    STALE_FILE_SECONDS = 3600
+
+    def __init__(self, db_params: dict, output_dir: str, lang: str = 'fr', backend: backends.TTSBackend = None,
+                 cache_dir: str = None, cache_max_size_mb: float = None, cache_max_age_days: float = None,
+                 max_workers: int = 1, requests_per_second: float = None, max_retries: int = 0,
+                 retry_backoff_seconds: float = 1.0, max_chunk_chars: int = None, dirty_only: bool = False,
+                 render_state_path: str = None, job_queue: render_queue.RenderQueue = None,
+                 normalizer: normalization.TextNormalizer = None):
         """
         Initializes the TTSProcessor with database parameters and output directory.
         :param db_params: Dictionary with PostgreSQL connection parameters
         :param output_dir: Directory to save the generated audio files
         :param lang: The language of the TTS, defaults to 'fr' (French)
+        :param backend: The TTS engine, defaults to gTTS in the given language
+        :param cache_dir: Directory of the content-addressed audio cache, None disables caching
+        :param cache_max_size_mb: Size above which least recently used cache entries are evicted
+        :param cache_max_age_days: Age after which unused cache entries are evicted
+        :param max_workers: Number of paragraphs synthesized concurrently
+        :param requests_per_second: Rate limit on calls to the TTS engine, None means unlimited
+        :param max_retries: Extra attempts for a paragraph whose synthesis failed
+        :param retry_backoff_seconds: Delay before the first retry, doubled on each attempt
+        :param max_chunk_chars: Split longer paragraphs at sentence boundaries and synthesize the chunks in parallel
+        :param dirty_only: Only render notes flagged as changed in wizetts.note_content, and clear the flag afterwards
+        :param render_state_path: File recording the rendered version of each note, defaults to
+                                  output_dir/.render_state.json. Processes rendering different notes
+                                  concurrently can share it.
+        :param job_queue: Render through this durable queue so that other workers can help and an
+                          interrupted run resumes where it stopped, None renders in-process only
+        :param normalizer: Rewrites every paragraph before synthesis (lexicon, Markdown stripping). Diffs and
+                           cache keys use the normalized text, so a lexicon change only re-renders the
+                           paragraphs it affects.
         """
         self.lang = lang
-        logger.info(f"Initializing TTSProcessor with language: {self.lang}")
+        self.backend = backend or backends.GTTSBackend(lang=lang)
+        logger.info(f"Initializing TTSProcessor with language: {self.lang}, backend: {self.backend.name}")
         self.db_params = db_params
+        self.postgres_client = postgres.PostgresClient(**db_params)
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)  # Ensure the output directory exists
+        self.cache = None
+        if cache_dir:
+            max_size_bytes = int(cache_max_size_mb * 1024 * 1024) if cache_max_size_mb else None
+            self.cache = audio_cache.AudioCache(cache_dir, max_size_bytes=max_size_bytes,
+                                                max_age_days=cache_max_age_days)
+        self.max_workers = max_workers
+        self.rate_limiter = concurrency.TokenBucket(requests_per_second) if requests_per_second else None
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_chunk_chars = max_chunk_chars
+        self.dirty_only = dirty_only
+        self.metrics = pipeline_metrics.MetricsRecorder()
+        self.render_state = paragraph_diff.RenderState(
+            render_state_path or os.path.join(output_dir, '.render_state.json'))
+        self.job_queue = job_queue
+        self.normalizer = normalizer
+        if self.backend.supports_batch:
+            # Each claim becomes one synthesize_many call
+            self.queue_batch_size = self.backend.preferred_batch_size()
+        else:
+            self.queue_batch_size = max(1, max_workers * 2)
+
+    def normalize(self, text: str) -> str:
+        """The text actually sent to the TTS engine."""
+        return self.normalizer.normalize(text) if self.normalizer is not None else text
+
+    def _cache_key(self, text: str) -> str:
+        return self.cache.make_key(text, self.lang, self.backend.name, self.backend.voice_settings())
+
+    def output_filename(self, note_name: str, order) -> str:
+        """Name of the audio file of a paragraph."""
+        return f"{note_name}_{order}{self.backend.extension}"
+
+    def _synthesize(self, text: str, file_path: str):
+        """
+        Call the backend once the rate limiter allows it. The audio is written to a temporary file
+        and only moved to file_path once it passed the sanity check.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        start = time.perf_counter()
+        with audio_files.atomic_output(file_path) as tmp_path:
+            self.backend.synthesize(text, tmp_path)
+            audio_files.check_audio(tmp_path, text)
+        self.metrics.observe('tts_latency_seconds', time.perf_counter() - start)
+        self.metrics.incr('tts_chars', len(text))
+
+    def _synthesize_many(self, items):
+        """Hand a list of (text, file_path) to a batching backend, recording the mean latency per item."""
+        tmp_paths = [audio_files.temp_path(file_path) for _, file_path in items]
+        start = time.perf_counter()
+        errors = self.backend.synthesize_many([(text, tmp_path) for (text, _), tmp_path in zip(items, tmp_paths)])
+        elapsed = time.perf_counter() - start
+        for index, ((text, file_path), tmp_path) in enumerate(zip(items, tmp_paths)):
+            self.metrics.observe('tts_latency_seconds', elapsed / len(items))
+            try:
+                if errors[index] is None:
+                    audio_files.check_audio(tmp_path, text)
+                    audio_files.commit(tmp_path, file_path)
+                    self.metrics.incr('tts_chars', len(text))
+            except Exception as e:
+                errors[index] = e
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return errors
+
+    def _plan(self, text: str, file_path: str, use_cache: bool = True):
+        """
+        Serves the paragraph from the cache or splits it into chunks to synthesize.
+        :param use_cache: False synthesizes again even when the cache holds the audio
+        :return: None on a cache hit or a blank paragraph, otherwise a list of (chunk_text, part_path)
+        """
+        if not text.strip():
+            # Separators such as "* * *" clean up to nothing, there is nothing to say
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            return None
+        if use_cache and self.cache is not None and self.cache.materialize(self._cache_key(text), file_path):
+            logger.info(f"Audio served from cache: {file_path}")
+            return None
+        chunks = chunking.split_into_chunks(text, self.max_chunk_chars) if self.max_chunk_chars else [text]
+        if len(chunks) <= 1:
+            return [(text, file_path)]
+        return [(chunk, f"{file_path}.part{i}{self.backend.extension}") for i, chunk in enumerate(chunks)]
+
+    def _finish(self, text: str, file_path: str, parts):
+        """Stitch the synthesized chunks into the paragraph file and store it in the cache."""
+        part_paths = [part_path for _, part_path in parts]
+        if part_paths != [file_path]:
+            with audio_files.atomic_output(file_path) as tmp_path:
+                audio_files.concat_audio(part_paths, tmp_path)
+            self._discard(file_path, parts)
+        if self.cache is not None:
+            self.cache.put(self._cache_key(text), file_path, extension=self.backend.extension)
+        logger.info(f"Audio saved as: {file_path}")
+
+    @staticmethod
+    def _discard(file_path: str, parts):
+        """Remove the chunk files of a paragraph."""
+        for _, part_path in parts:
+            if part_path != file_path and os.path.exists(part_path):
+                os.remove(part_path)
+
+    def render(self, text: str, output_filename: str):
+        """
+        Serves the audio from the cache or synthesizes it, raising on failure.
+        :param text: The text to convert to speech
+        :param output_filename: The filename for saving the audio file
+        :return: The path of the audio file
+        """
+        text = self.normalize(text)
+        file_path = os.path.join(self.output_dir, output_filename)
+        parts = self._plan(text, file_path)
+        if parts is None:
+            return file_path
+        try:
+            for chunk, part_path in parts:
+                self._synthesize(chunk, part_path)
+        except Exception:
+            self._discard(file_path, parts)
+            raise
+        self._finish(text, file_path, parts)
+        return file_path
 
     def process_text_to_speech(self, text: str, output_filename: str):
         """
@@ -36,61 +205,467 @@ class TTSProcessor:
         """
         try:
             logger.info(f"Converting text to speech for file: {output_filename}")
+            self.render(text, output_filename)
+        except Exception as e:
+            logger.error(f"Failed to process text: {e}")
+
+    def render_jobs(self, jobs, use_cache: bool = True):
+        """
+        Renders (text, output_filename) jobs. Long paragraphs are split into chunks, every chunk
+        is synthesized on the worker pool (or in backend batches) and stitched back in order.
+        :param jobs: Iterable of (text, output_filename) tuples
+        :param use_cache: False synthesizes every job again, replacing its cached audio
+        :return: List of output filenames that could not be rendered
+        """
+        paragraphs = []
+        work = []
+        for text, output_filename in jobs:
             file_path = os.path.join(self.output_dir, output_filename)
+            parts = self._plan(text, file_path, use_cache=use_cache)
+            if parts is not None:
+                paragraphs.append((text, file_path, parts))
+                work += parts
+
+        logger.info(f"Synthesizing {len(paragraphs)} paragraphs ({len(work)} chunks) with {self.backend.name}.")
+        if self.backend.supports_batch:
+            errors = iter(self._synthesize_many(work) if work else [])
+        else:
+            results = concurrency.map_concurrently(
+                lambda item: self._synthesize(*item),
+                work,
+                max_workers=self.max_workers,
+                max_retries=self.max_retries,
+                backoff_seconds=self.retry_backoff_seconds,
+            )
+            errors = (result.error for result in results)
 
-            tts = gTTS(text=text, lang=self.lang)
-            tts.save(file_path)
+        failed = []
+        for index, (text, file_path, parts) in enumerate(paragraphs):
+            paragraph_errors = [error for _, error in zip(parts, errors) if error is not None]
+            if paragraph_errors:
+                logger.error(f"[{index + 1}] Failed to process {file_path}: {paragraph_errors[0]}")
+                self._discard(file_path, parts)
+                failed.append(os.path.basename(file_path))
+                continue
+            try:
+                self._finish(text, file_path, parts)
+            except Exception as e:
+                logger.error(f"[{index + 1}] Failed to assemble {file_path}: {e}")
+                failed.append(os.path.basename(file_path))
+        self.metrics.incr('paragraphs_synthesized', len(paragraphs) - len(failed))
+        self.metrics.incr('paragraphs_failed', len(failed))
+        if failed:
+            logger.warning(f"{len(failed)} paragraph(s) could not be rendered.")
+        return failed
 
-            logger.info(f"Audio saved as: {file_path}")
-        except Exception as e:
-            logger.error(f"Failed to process text: {e}")
+    def paragraph_query(self) -> str:
+        """Query returning the paragraphs to render."""
+        where = ""
+        if self.dirty_only:
+            where = "WHERE content_id IN (SELECT content_id FROM wizetts.note_content WHERE is_dirty)"
+        return f"""
+            SELECT note_name, paragrapge_order, content AS paragraphe_content
+            FROM wizetts.cleaned_paragraphes
+            {where}
+            ORDER BY note_name, paragrapge_order;
+            """
+
+    def search_paragraphs(self, query: str = None, note_names=None, first_order: int = None, last_order: int = None,
+                          table: str = 'wizetts.cleaned_paragraphes'):
+        """
+        Selects paragraphs with the French full-text index of the paragraph table.
+        :param query: Web-search syntax, e.g. Mia, "pluie d'étoiles" (a phrase) or Mia -Gamé, None matches everything
+        :param note_names: Notes to search, ILIKE patterns such as 'Partie 1%' are accepted
+        :param first_order: Lowest paragraph order, inclusive
+        :param last_order: Highest paragraph order, inclusive
+        :param table: wizetts.cleaned_paragraphes (dbt) or wizetts.native_cleaned_paragraphes
+        :return: List of (note_name, paragrapge_order, paragraphe_content) rows, ordered by note
+        """
+        conditions = []
+        params = {}
+        if query:
+            # Same expression as the GIN index so that the planner uses it
+            conditions.append("to_tsvector('french', content) @@ websearch_to_tsquery('french', %(query)s)")
+            params['query'] = query
+        if note_names:
+            conditions.append("note_name ILIKE ANY(%(note_names)s)")
+            params['note_names'] = list(note_names)
+        if first_order is not None:
+            conditions.append("paragrapge_order >= %(first_order)s")
+            params['first_order'] = first_order
+        if last_order is not None:
+            conditions.append("paragrapge_order <= %(last_order)s")
+            params['last_order'] = last_order
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.postgres_client.execute_query(f"""
+            SELECT note_name, paragrapge_order, content AS paragraphe_content
+            FROM {table}
+            {where}
+            ORDER BY note_name, paragrapge_order;
+            """, params=params or None) or []
+        logger.info(f"{len(rows)} paragraphs selected.")
+        return rows
+
+    def rerender_paragraphs(self, rows, force: bool = True):
+        """
+        Renders the given paragraphs only, without diffing their notes.
+        :param rows: (note_name, paragrapge_order, paragraphe_content) rows, e.g. from search_paragraphs
+        :param force: Synthesize again even if the audio is cached, e.g. to retry a bad rendering
+        :return: List of output filenames that could not be rendered
+        """
+        jobs = [(self.normalize(content), self.output_filename(note_name, order)) for note_name, order, content in rows]
+        self.metrics.incr('paragraphs_seen', len(jobs))
+        with self.metrics.timer('tts_wall'):
+            failed = self.render_jobs(jobs, use_cache=not force)
+
+        # The files now say the selected text, which may be newer than the last render of its note: record
+        # it so that the next diff of the note does not relink them as the paragraphs they replaced
+        rendered = [(row, text, filename) for row, (text, filename) in zip(rows, jobs) if filename not in failed]
+        for (note_name, order, _), text, _ in rendered:
+            hashes = self.render_state.get(note_name)
+            if hashes is None:
+                continue  # Never rendered, the next run renders the whole note
+            hashes = hashes + [None] * (order - len(hashes))
+            hashes[order - 1] = paragraph_diff.paragraph_hash(text)
+            self.render_state.set(note_name, hashes)
+        self.render_state.save()
+        if self.job_queue is not None:
+            self.job_queue.forget([filename for _, _, filename in rendered])
+        return failed
+
+    def fetch_dirty_notes(self):
+        """
+        Lists the notes flagged as changed since their audio was last rendered.
+        :return: List of (content_id, content_hash, note_name) tuples
+        """
+        query = "SELECT content_id, content_hash, note_name FROM wizetts.note_content WHERE is_dirty;"
+        return self.postgres_client.execute_query(query) or []
+
+    def mark_notes_clean(self, dirty_notes, failed_note_names=()):
+        """
+        Clears the dirty flag of rendered notes, unless their content changed again meanwhile.
+        :param dirty_notes: Tuples returned by fetch_dirty_notes at the start of the run
+        :param failed_note_names: Notes with paragraphs that failed, they stay dirty
+        """
+        rows = [(content_id, content_hash) for content_id, content_hash, note_name in dirty_notes
+                if note_name not in failed_note_names]
+        self.postgres_client.execute_many(
+            """
+            UPDATE wizetts.note_content AS nc
+            SET is_dirty = false
+            FROM (VALUES %s) AS rendered (content_id, content_hash)
+            WHERE nc.content_id = rendered.content_id
+              AND nc.content_hash IS NOT DISTINCT FROM rendered.content_hash;
+            """,
+            rows
+        )
+        logger.info(f"Marked {len(rows)} of {len(dirty_notes)} dirty notes as rendered.")
 
     def fetch_paragraph_data_from_postgres(self):
         """
         Fetches the paragraph content from the PostgreSQL database.
         :return: A pandas DataFrame with the fetched paragraph content
         """
+        import pandas as pd  # Only the non-streaming path needs pandas
+
         logger.info("Fetching paragraph data from PostgreSQL...")
         try:
-            # Connect to the PostgreSQL database
-            connection = psycopg2.connect(
-                host=self.db_params['host'],
-                port=self.db_params['port'],
-                database=self.db_params['database'],
-                user=self.db_params['user'],
-                password=self.db_params['password']
-            )
-            query = """
-            SELECT note_name, paragrapge_order, content AS paragraphe_content
-            FROM wizetts.cleaned_paragraphes
-            ORDER BY note_name, paragrapge_order;
-            """
-            df = pd.read_sql(query, connection)
-            connection.close()
+            # Borrow a pooled connection to the PostgreSQL database
+            with self.postgres_client.connection() as connection:
+                df = pd.read_sql(self.paragraph_query(), connection)
             logger.info(f"Fetched {len(df)} paragraphs from the database.")
             return df
         except Exception as e:
             logger.error(f"Failed to fetch data from PostgreSQL: {e}")
             return pd.DataFrame()  # Return an empty DataFrame in case of error
 
-    def generate_audio_for_paragraphs(self):
+    def iter_paragraph_batches(self, batch_size: int = 200):
+        """
+        Streams the paragraph content with a server-side cursor, so memory stays flat.
+        :param batch_size: Number of rows fetched per round-trip
+        :return: Generator of lists of (note_name, paragrapge_order, paragraphe_content) tuples
+        """
+        logger.info(f"Streaming paragraph data from PostgreSQL in batches of {batch_size}...")
+        with self.postgres_client.connection() as connection:
+            with connection.cursor(name='tts_paragraph_stream') as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(self.paragraph_query())
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+
+    @staticmethod
+    def _group_by_note(batches):
+        """
+        Regroups batches of rows ordered by note into complete notes.
+        :return: Generator of lists of (note_name, rows), one list per input batch that completed notes
+        """
+        current_name, current_rows = None, []
+        for rows in batches:
+            complete = []
+            for row in rows:
+                if row[0] != current_name and current_rows:
+                    complete.append((current_name, current_rows))
+                    current_rows = []
+                current_name = row[0]
+                current_rows.append(row)
+            if complete:
+                yield complete
+        if current_rows:
+            yield [(current_name, current_rows)]
+
+    def plan_note(self, note_name: str, rows):
+        """
+        Diffs a note against its rendered version, relinks moved paragraphs and drops deleted ones.
+        :param note_name: The note
+        :param rows: All (note_name, paragrapge_order, paragraphe_content) rows of the note, in order
+        :return: (jobs to render, paragraph hashes, output filenames)
+        """
+        rows = [(name, order, self.normalize(content)) for name, order, content in rows]
+        hashes = [paragraph_diff.paragraph_hash(content) for _, _, content in rows]
+        filenames = [self.output_filename(note_name, order) for _, order, _ in rows]
+        jobs = [(content, filename) for (_, _, content), filename in zip(rows, filenames)]
+
+        previous = self.render_state.get(note_name)
+        if previous is None:
+            return jobs, hashes, filenames
+
+        diff = paragraph_diff.diff_paragraphs(previous, hashes)
+        logger.info(f"{note_name}: {diff}")
+        if diff.moved or len(previous) > len(hashes):
+            # Forget the files about to move first, so that a crash midway re-renders them on the next run
+            # instead of moving them a second time
+            touched = {order for orders in diff.moved for order in orders}
+            touched.update(range(len(hashes) + 1, len(previous) + 1))
+            self.render_state.set(note_name, [None if order in touched else paragraph_hash
+                                              for order, paragraph_hash in enumerate(previous, start=1)])
+            self.render_state.save()
+            if self.job_queue is not None:
+                # Jobs done for these files describe audio that is about to move
+                self.job_queue.forget([self.output_filename(note_name, order) for order in sorted(touched)])
+            self._relink(note_name, diff, len(previous), len(hashes))
+
+        to_render = set(diff.to_render())
+        jobs = [job for order, job in enumerate(jobs, start=1)
+                if order in to_render or not os.path.exists(os.path.join(self.output_dir, job[1]))]
+        # What is on disk now, the paragraphs still to render count as unrendered until they are
+        pending = {filename for _, filename in jobs}
+        self.render_state.set(note_name, [None if filename in pending else paragraph_hash
+                                          for paragraph_hash, filename in zip(hashes, filenames)])
+        self.render_state.save()
+        return jobs, hashes, filenames
+
+    def _relink(self, note_name: str, diff, previous_count: int, current_count: int):
+        """Rename the audio of moved paragraphs and remove the files past the end of the note."""
+        def path(order):
+            return os.path.join(self.output_dir, self.output_filename(note_name, order))
+
+        # Two phases so that swapping paragraphs never overwrites a file still to be moved
+        staged = []
+        silent = []
+        for old_order, new_order in diff.moved:
+            if os.path.exists(path(old_order)):
+                staging_path = f"{path(old_order)}.moving"
+                os.replace(path(old_order), staging_path)
+                staged.append((staging_path, path(new_order)))
+            else:
+                silent.append(path(new_order))
+        # A moved blank paragraph has no audio, whatever was at its new position is stale
+        for destination in silent:
+            if os.path.exists(destination):
+                os.remove(destination)
+        for staging_path, destination in staged:
+            os.replace(staging_path, destination)
+
+        for order in range(current_count + 1, previous_count + 1):
+            if os.path.exists(path(order)):
+                os.remove(path(order))
+
+    def assemble_chapters(self, chapters_dir: str, opus_bitrate: str = None, note_names=None, force: bool = False):
+        """
+        Concatenates the paragraph audio of each fully rendered note into one chapter file with an offset index.
+        :param chapters_dir: Directory of the chapter files
+        :param opus_bitrate: Transcode the chapters to Opus at this bitrate (requires ffmpeg)
+        :param note_names: Notes to assemble, every note of the render state by default
+        :param force: Also rebuild the chapters whose paragraph text did not change, e.g. after rerender_paragraphs
+        :return: Number of chapters (re)assembled, unchanged ones are skipped
+        """
+        assembled = 0
+        for note_name in note_names if note_names is not None else sorted(self.render_state.notes):
+            hashes = self.render_state.get(note_name)
+            if not hashes or None in hashes:
+                logger.warning(f"{note_name} is not fully rendered, chapter not assembled.")
+                continue
+            paragraphs = []
+            for order in range(1, len(hashes) + 1):
+                file_path = os.path.join(self.output_dir, self.output_filename(note_name, order))
+                if os.path.exists(file_path):  # Blank paragraphs have no audio
+                    paragraphs.append((order, file_path))
+            settings = json.dumps([hashes, self.backend.name, self.backend.voice_settings()], sort_keys=True)
+            version = hashlib.sha256(settings.encode('utf-8')).hexdigest()
+            try:
+                with self.metrics.timer('chapter_assembly'):
+                    if chapters.assemble_chapter(note_name, paragraphs, chapters_dir, version=version,
+                                                 opus_bitrate=opus_bitrate, force=force):
+                        assembled += 1
+            except Exception as e:
+                logger.error(f"Failed to assemble the chapter of {note_name}: {e}")
+                self.metrics.incr('chapters_failed')
+        self.metrics.incr('chapters_assembled', assembled)
+        return assembled
+
+    def finish_run(self, close_backend: bool = True):
+        """
+        Garbage-collect and persist the audio cache at the end of a run.
+        :param close_backend: Also stop the backend's worker processes, a long-lived worker keeps them
+        """
+        self.metrics.rate('tts_chars_per_second', 'tts_chars', 'tts_wall_seconds')
+        if self.cache is not None:
+            lookups = self.cache.hits + self.cache.misses
+            self.metrics.set('cache_hits', self.cache.hits)
+            self.metrics.set('cache_misses', self.cache.misses)
+            self.metrics.set('cache_hit_ratio', self.cache.hits / lookups if lookups else None)
+            self.cache.garbage_collect()
+            self.cache.save()
+            logger.info(f"Audio cache: {self.cache.hits} hits, {self.cache.misses} misses.")
+        self._remove_stale_files()
+        if close_backend:
+            self.backend.close()
+
+    def _remove_stale_files(self):
+        """Delete the temporary and chunk files that crashed workers left in the output directory."""
+        cutoff = time.time() - self.STALE_FILE_SECONDS
+        for file_name in os.listdir(self.output_dir):
+            if not (audio_files.TEMP_FILE.search(file_name) or CHUNK_FILE.search(file_name)
+                    or file_name.endswith(".moving")):
+                continue
+            path = os.path.join(self.output_dir, file_name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    logger.info(f"Removed stale file {path}")
+            except FileNotFoundError:
+                pass
+
+    def generate_audio_for_paragraphs(self, stream: bool = False, batch_size: int = 200):
         """
         Fetches paragraph content from PostgreSQL and converts each paragraph to speech.
+        :param stream: Fetch the paragraphs in batches and synthesize each batch as soon as it arrives
+        :param batch_size: Number of paragraphs per batch when streaming
         """
+        import psycopg2
+
         logger.info("Starting audio generation for paragraphs...")
-        # Fetch the paragraph data from PostgreSQL
-        paragraph_data = self.fetch_paragraph_data_from_postgres()
+        dirty_notes = self.fetch_dirty_notes() if self.dirty_only else []
+        if self.dirty_only:
+            logger.info(f"{len(dirty_notes)} notes changed since the last render.")
 
-        if paragraph_data.empty:
+        if stream:
+            batches = self.iter_paragraph_batches(batch_size)
+        else:
+            # Fetch the paragraph data from PostgreSQL
+            paragraph_data = self.fetch_paragraph_data_from_postgres()
+            columns = ['note_name', 'paragrapge_order', 'paragraphe_content']
+            batches = []
+            if not paragraph_data.empty:
+                batches.append(list(paragraph_data[columns].itertuples(index=False, name=None)))
+
+        try:
+            with self.metrics.timer('tts_wall'):
+                total, failed_note_names = self.render_paragraph_batches(batches)
+        except psycopg2.Error as e:
+            logger.error(f"Failed to stream data from PostgreSQL: {e}")
+            return
+
+        if total == 0:
             logger.warning("No data fetched from the database.")
             return
+        if dirty_notes:
+            self.mark_notes_clean(dirty_notes, failed_note_names)
+        self.finish_run()
 
-        # Process each paragraph
-        for _, row in paragraph_data.iterrows():
-            text = row['paragraphe_content']
-            note_name = row['note_name']
-            order = row['paragrapge_order']
-            output_filename = f"{note_name}_{order}.mp3"
-            self.process_text_to_speech(text, output_filename)
+    def _render_through_queue(self, queue_jobs, note_names):
+        """
+        Enqueues the jobs of a batch of notes and works the queue until none of their jobs is left.
+        :param queue_jobs: List of (note_name, paragrapge_order, content, paragraph_hash, output_filename)
+        :param note_names: The notes of the batch
+        :return: Set of output filenames that are not rendered yet
+        """
+        present, missing = [], []
+        for job in queue_jobs:
+            (present if os.path.exists(os.path.join(self.output_dir, job[4])) else missing).append(job)
+        self.job_queue.enqueue(present)
+        # A job done earlier whose audio file disappeared must run again
+        self.job_queue.enqueue(missing, reset_done=True)
+        self.drain_queue(note_names=note_names, wait=True)
+        statuses = self.job_queue.statuses([job[4] for job in queue_jobs])
+        return {filename for _, _, _, paragraph_hash, filename in queue_jobs
+                if statuses.get(filename) != (render_queue.DONE, paragraph_hash)}
 
+    def drain_queue(self, note_names=None, wait: bool = False, worker_id: str = None):
+        """
+        Claims and renders queued jobs until there is nothing left to claim.
+        :param note_names: Only work on the jobs of these notes, any note by default
+        :param wait: Keep polling while other workers hold leases on matching jobs
+        :param worker_id: Lease owner, defaults to host:pid
+        :return: (number of jobs rendered, number of jobs failed)
+        """
+        worker_id = worker_id or render_queue.default_worker_id()
+        # Jobs left leased by a crashed process of this host would otherwise wait for their lease to expire
+        self.job_queue.release_dead_leases(worker_id)
+        rendered = failed_count = 0
+        while True:
+            rows = self.job_queue.claim(worker_id, self.queue_batch_size, note_names)
+            if rows:
+                failed = set(self.render_jobs([(content, filename) for _, _, content, filename in rows]))
+                self.job_queue.complete(worker_id, [filename for *_, filename in rows if filename not in failed])
+                self.job_queue.fail(worker_id, sorted(failed), "synthesis failed, see the worker logs")
+                rendered += len(rows) - len(failed)
+                failed_count += len(failed)
+                continue
+            if not wait or self.job_queue.count_in_progress(note_names) == 0:
+                break
+            time.sleep(self.QUEUE_POLL_SECONDS)
+        self.metrics.incr('queue_jobs_rendered', rendered)
+        self.metrics.incr('queue_jobs_failed', failed_count)
+        return rendered, failed_count
+
+    def render_paragraph_batches(self, batches):
+        """
+        Renders batches of paragraph rows, diffing each note against its rendered version.
+        :param batches: Iterable of lists of (note_name, paragrapge_order, paragraphe_content) rows, ordered by note
+        :return: (number of paragraphs seen, set of note names with failed paragraphs)
+        """
+        total = 0
+        failed_note_names = set()
+        for notes in self._group_by_note(batches):
+            jobs = []
+            queue_jobs = []
+            planned = []
+            for note_name, rows in notes:
+                note_jobs, hashes, filenames = self.plan_note(note_name, rows)
+                jobs += note_jobs
+                planned.append((note_name, hashes, filenames))
+                total += len(rows)
+                # Jobs carry the normalized text
+                job_texts = {filename: text for text, filename in note_jobs}
+                queue_jobs += [(note_name, order, job_texts[filename], paragraph_hash, filename)
+                               for (_, order, _), paragraph_hash, filename in zip(rows, hashes, filenames)
+                               if filename in job_texts]
+            self.metrics.incr('paragraphs_seen', sum(len(rows) for _, rows in notes))
 
+            if self.job_queue is None:
+                failed = set(self.render_jobs(jobs))
+            else:
+                failed = self._render_through_queue(queue_jobs, [note_name for note_name, _ in notes])
+            for note_name, hashes, filenames in planned:
+                # Failed paragraphs are recorded as unrendered so the next run retries them
+                self.render_state.set(note_name, [None if filename in failed else paragraph_hash
+                                                  for paragraph_hash, filename in zip(hashes, filenames)])
+                if failed.intersection(filenames):
+                    failed_note_names.add(note_name)
+            self.render_state.save()
+            logger.info(f"Processed {total} paragraphs so far.")
+        return total, failed_note_names
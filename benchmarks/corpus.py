@@ -0,0 +1,52 @@
+import random
+
+# Small French vocabulary, including the WizeCosm names that matter for pronunciation
+WORDS = [
+    "le", "la", "les", "un", "une", "des", "et", "mais", "dans", "sur", "sous", "avec", "sans", "pour",
+    "vers", "navire", "équipage", "étoile", "île", "mer", "ciel", "vent", "voile", "guerre", "nuit",
+    "lumière", "silence", "regard", "souvenir", "traversée", "découverte", "capitaine", "horizon",
+    "regardait", "murmura", "avançait", "tomba", "répondit", "attendait", "glissait", "brillait",
+    "lentement", "soudain", "encore", "toujours", "jamais", "déjà", "presque", "ensemble",
+    "Mia", "Yamés", "Gamé", "WizeCosm",
+]
+PUNCTUATION = [".", ".", ".", "!", "?", "..."]
+
+
+def make_sentence(rng: random.Random, min_words: int = 6, max_words: int = 20) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    sentence = " ".join(words)
+    if rng.random() < 0.3:
+        cut = rng.randint(1, len(words) - 1)
+        sentence = " ".join(words[:cut]) + ", " + " ".join(words[cut:])
+    if rng.random() < 0.15:
+        sentence = f"“{sentence}”"
+    return sentence[0].upper() + sentence[1:] + rng.choice(PUNCTUATION)
+
+
+def make_paragraph(rng: random.Random, min_sentences: int = 1, max_sentences: int = 8) -> str:
+    return " ".join(make_sentence(rng) for _ in range(rng.randint(min_sentences, max_sentences)))
+
+
+def make_corpus(notes: int = 7, paragraphs_per_note: int = 60, min_sentences: int = 1,
+                max_sentences: int = 8, separator_ratio: float = 0.02, seed: int = 42):
+    """
+    Generates a reproducible set of French Markdown notes.
+    :param notes: Number of notes
+    :param paragraphs_per_note: Number of paragraphs in each note
+    :param min_sentences: Minimum sentences per paragraph
+    :param max_sentences: Maximum sentences per paragraph
+    :param separator_ratio: Share of paragraphs replaced by a "* * *" scene separator
+    :param seed: Random seed, the same seed always yields the same corpus
+    :return: Dict of note name -> Markdown content
+    """
+    rng = random.Random(seed)
+    corpus = {}
+    for index in range(1, notes + 1):
+        paragraphs = []
+        for _ in range(paragraphs_per_note):
+            if rng.random() < separator_ratio:
+                paragraphs.append("* * *")
+            else:
+                paragraphs.append(make_paragraph(rng, min_sentences, max_sentences))
+        corpus[f"Partie {index} - Synthétique.md"] = "\n\n".join(paragraphs)
+    return corpus
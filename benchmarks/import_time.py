@@ -0,0 +1,90 @@
+"""
+Import time of the pipeline modules, each measured in a fresh interpreter with python -X importtime.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget-ms 1500 --output benchmarks/results/import_time.json
+
+Fails when a module pulls in one of HEAVY_MODULES at import time, or takes longer than the budget.
+Every Dagster code-location load and every step process of the multiprocess executor pays this cost.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    'dagster_main',
+    'dagster_assets',
+    'icloud.icloud_loader',
+    'postgres.postgres',
+    'TTS_gtts.text_to_speech',
+    'markdown_parsing.paragraphs',
+]
+
+# Only the steps that need them may import these
+HEAVY_MODULES = ['pandas', 'psycopg2', 'pyicloud', 'gtts', 'torch', 'TTS']
+
+
+def measure_import(module: str, repeat: int = 3) -> dict:
+    """
+    Imports a module in fresh interpreters.
+    :param module: Dotted module name, relative to the repository root
+    :param repeat: Number of interpreters, the fastest one is kept
+    :return: Dict with the import time in milliseconds and the heavy modules it loaded, or the error
+    """
+    best = None
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                 cwd=ROOT, capture_output=True, text=True)
+        if process.returncode != 0:
+            return {'error': process.stderr.strip().splitlines()[-1]}
+        imported = {}
+        for line in process.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            if not line.startswith('import time:') or 'imported package' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            imported[name.strip()] = int(cumulative)
+        milliseconds = imported.get(module, 0) / 1000
+        if best is None or milliseconds < best['milliseconds']:
+            heavy = sorted({name.split('.')[0] for name in imported} & set(HEAVY_MODULES))
+            best = {'milliseconds': milliseconds, 'modules': len(imported), 'heavy_imports': heavy}
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=None, help='maximum import time of any module')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = {module: measure_import(module, args.repeat) for module in MODULES}
+    failures = []
+    print(f"{'module':<32}{'ms':>10}{'modules':>10}  heavy imports")
+    for module, result in results.items():
+        if 'error' in result:
+            print(f"{module:<32}{'error':>10}{'':>10}  {result['error']}")
+            failures.append(f"{module} cannot be imported")
+            continue
+        print(f"{module:<32}{result['milliseconds']:>10.1f}{result['modules']:>10}  "
+              f"{', '.join(result['heavy_imports']) or '-'}")
+        if result['heavy_imports']:
+            failures.append(f"{module} imports {', '.join(result['heavy_imports'])}")
+        if args.budget_ms is not None and result['milliseconds'] > args.budget_ms:
+            failures.append(f"{module} takes {result['milliseconds']:.0f}ms (budget {args.budget_ms:.0f}ms)")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
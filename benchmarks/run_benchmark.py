@@ -0,0 +1,170 @@
+"""
+Benchmark of the ingest -> parse -> synthesize pipeline on a synthetic corpus.
+
+    python -m benchmarks.run_benchmark --notes 7 --paragraphs 60 --latency-ms 200 --workers 8
+    python -m benchmarks.run_benchmark --compare benchmarks/results/<other commit>.json
+
+Results are written to benchmarks/results/<commit>.json. The TTS engine is a stub with
+configurable latency, the database is an in-memory stand-in unless --postgres-config points
+to a conf.yaml with a postgresql section (use a disposable local database).
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import yaml
+
+from benchmarks import corpus, stubs
+from markdown_parsing import paragraphs
+from postgres import postgres
+from TTS_gtts import text_to_speech
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+@contextmanager
+def measure(results: dict, stage: str):
+    """Record wall time and peak traced memory of a stage."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    stats = {}
+    try:
+        yield stats
+    finally:
+        stats['seconds'] = time.perf_counter() - start
+        stats['peak_memory_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+        results[stage] = stats
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def make_postgres_client(args):
+    if not args.postgres_config:
+        return stubs.FakePostgresClient(round_trip_ms=args.round_trip_ms)
+    with open(args.postgres_config, 'r') as file:
+        config = yaml.safe_load(file)['postgresql']
+    return postgres.PostgresClient(host=config['host'], port=config['port'], database=config['database'],
+                                   user=config['user'], password=config['password'])
+
+
+def run(args) -> dict:
+    notes = corpus.make_corpus(notes=args.notes, paragraphs_per_note=args.paragraphs,
+                               min_sentences=args.min_sentences, max_sentences=args.max_sentences,
+                               seed=args.seed)
+    postgres_client = make_postgres_client(args)
+    stages = {}
+
+    total_start = time.perf_counter()
+    with measure(stages, 'ingest') as stats:
+        rows = [(name, content) for name, content in notes.items()]
+        with postgres_client.transaction():
+            postgres_client.bulk_upsert('wizetts.note_content', ['note_name', 'content'], rows,
+                                        conflict_columns=['note_name'])
+        stats['notes'] = len(rows)
+        stats['bytes'] = sum(len(content.encode('utf-8')) for _, content in rows)
+
+    with measure(stages, 'parse') as stats:
+        parsed = [(content_id, list(paragraphs.parse_note(name, content)))
+                  for content_id, (name, content) in enumerate(notes.items(), start=1)]
+        stats['paragraphs'] = sum(len(note_rows) for _, note_rows in parsed)
+
+    with measure(stages, 'db_write') as stats:
+        start = time.perf_counter()
+        stats['rows'] = paragraphs.write_paragraphs(postgres_client, parsed)
+        stats['rows_per_second'] = stats['rows'] / max(time.perf_counter() - start, 1e-9)
+
+    output_dir = tempfile.mkdtemp(prefix='wizetts_bench_')
+    try:
+        processor = text_to_speech.TTSProcessor(
+            db_params={'host': None, 'port': None, 'database': None, 'user': None, 'password': None},
+            output_dir=output_dir,
+            backend=stubs.StubBackend(latency_ms=args.latency_ms, per_char_ms=args.per_char_ms),
+            cache_dir=os.path.join(output_dir, '.cache') if args.cache else None,
+            max_workers=args.workers,
+            max_chunk_chars=args.max_chunk_chars,
+        )
+        for label in ['synthesize'] + (['synthesize_rerun'] if args.rerun else []):
+            with measure(stages, label) as stats:
+                with processor.metrics.timer('tts_wall'):
+                    total, failed = processor.render_paragraph_batches(note_rows for _, note_rows in parsed)
+                processor.finish_run()
+                summary = processor.metrics.summary()
+                stats['paragraphs'] = total
+                stats['failed_notes'] = len(failed)
+                for name in ('tts_latency_seconds_p50', 'tts_latency_seconds_p95', 'tts_chars_per_second',
+                             'cache_hit_ratio', 'paragraphs_synthesized'):
+                    stats[name] = summary.get(name)
+            processor.metrics = type(processor.metrics)()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    return {
+        'commit': git_commit(),
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'parameters': vars(args),
+        'end_to_end_seconds': time.perf_counter() - total_start,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'db_round_trips': getattr(postgres_client, 'round_trips', None),
+        'stages': stages,
+    }
+
+
+def compare(current: dict, baseline: dict):
+    """Print the relative change of every stage duration."""
+    print(f"{'stage':<20}{baseline['commit']:>12}{current['commit']:>12}{'change':>10}")
+    for stage, stats in current['stages'].items():
+        before = baseline['stages'].get(stage, {}).get('seconds')
+        after = stats['seconds']
+        change = f"{(after - before) / before:+.1%}" if before else 'n/a'
+        print(f"{stage:<20}{before or float('nan'):>12.3f}{after:>12.3f}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--notes', type=int, default=7)
+    parser.add_argument('--paragraphs', type=int, default=60, help='paragraphs per note')
+    parser.add_argument('--min-sentences', type=int, default=1)
+    parser.add_argument('--max-sentences', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--latency-ms', type=float, default=200.0, help='stub TTS latency per call')
+    parser.add_argument('--per-char-ms', type=float, default=0.0, help='stub TTS latency per character')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-chunk-chars', type=int, default=400)
+    parser.add_argument('--no-cache', dest='cache', action='store_false')
+    parser.add_argument('--rerun', action='store_true', help='synthesize a second time to measure the no-op path')
+    parser.add_argument('--round-trip-ms', type=float, default=1.0, help='latency of the in-memory database')
+    parser.add_argument('--postgres-config', help='conf.yaml of a disposable local PostgreSQL database')
+    parser.add_argument('--compare', help='result file of another commit')
+    parser.add_argument('--output', help='result file, defaults to benchmarks/results/<commit>.json')
+    args = parser.parse_args()
+
+    result = run(args)
+    output = args.output or os.path.join(RESULTS_DIR, f"{result['commit']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(result, file, indent=2, default=str)
+    print(json.dumps(result['stages'], indent=2))
+    print(f"End to end: {result['end_to_end_seconds']:.2f}s, results written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            compare(result, json.load(file))
+
+
+if __name__ == '__main__':
+    main()
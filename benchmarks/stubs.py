@@ -0,0 +1,90 @@
+import threading
+import time
+
+from TTS_gtts import backends
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, no padding: 417 bytes and 1152 samples per frame
+MP3_FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0x64])
+MP3_FRAME_SIZE = 417
+MP3_FRAME_SECONDS = 1152 / 44100
+
+
+def fake_mp3_bytes(duration_seconds: float) -> bytes:
+    """Silent-looking MP3 stream of roughly the given duration, made of valid frame headers."""
+    frames = max(1, int(duration_seconds / MP3_FRAME_SECONDS))
+    frame = MP3_FRAME_HEADER + bytes(MP3_FRAME_SIZE - len(MP3_FRAME_HEADER))
+    return frame * frames
+
+
+class StubBackend(backends.TTSBackend):
+    name = 'stub'
+
+    def __init__(self, latency_ms: float = 200.0, per_char_ms: float = 0.0, chars_per_second: float = 15.0):
+        """
+        Stand-in for a remote TTS engine.
+        :param latency_ms: Fixed latency of every call
+        :param per_char_ms: Additional latency per character
+        :param chars_per_second: Speaking rate used to size the produced audio
+        """
+        self.latency_ms = latency_ms
+        self.per_char_ms = per_char_ms
+        self.chars_per_second = chars_per_second
+
+    def voice_settings(self) -> dict:
+        return {'chars_per_second': self.chars_per_second}
+
+    def synthesize(self, text: str, file_path: str):
+        time.sleep((self.latency_ms + self.per_char_ms * len(text)) / 1000)
+        with open(file_path, 'wb') as file:
+            file.write(fake_mp3_bytes(len(text) / self.chars_per_second))
+
+
+class FakePostgresClient:
+    def __init__(self, round_trip_ms: float = 1.0, page_size: int = 500):
+        """
+        In-memory stand-in for postgres.PostgresClient, counting round-trips and sleeping
+        round_trip_ms for each of them. Statements are not interpreted, rows sent in bulk are kept.
+        :param round_trip_ms: Simulated network + server time of one statement
+        :param page_size: Rows per round-trip of execute_many
+        """
+        self.round_trip_ms = round_trip_ms
+        self.page_size = page_size
+        self.round_trips = 0
+        self.rows = {}
+        self.lock = threading.Lock()
+
+    def _round_trip(self, count: int = 1):
+        with self.lock:
+            self.round_trips += count
+        time.sleep(self.round_trip_ms * count / 1000)
+
+    class _Transaction:
+        def __init__(self, client):
+            self.client = client
+
+        def __enter__(self):
+            self.client._round_trip()  # BEGIN
+            return self
+
+        def __exit__(self, exc_type, exc, traceback):
+            self.client._round_trip()  # COMMIT / ROLLBACK
+            return False
+
+    def transaction(self):
+        return self._Transaction(self)
+
+    def execute_query(self, query, params=None, fetch=True):
+        self._round_trip()
+        return [] if fetch else None
+
+    def execute_many(self, query, rows, page_size=None):
+        rows = list(rows)
+        page_size = page_size or self.page_size
+        self._round_trip(max(1, -(-len(rows) // page_size)))
+        table = query.split("INTO", 1)[-1].split()[0] if "INTO" in query else "unknown"
+        with self.lock:
+            self.rows.setdefault(table, []).extend(rows)
+        return len(rows)
+
+    def bulk_upsert(self, table, columns, rows, conflict_columns, update_columns=None, page_size=None):
+        return self.execute_many(f"INSERT INTO {table} VALUES %s", rows, page_size=page_size)
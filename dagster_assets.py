@@ -0,0 +1,189 @@
+from dagster import (
+    asset, define_asset_job, schedule, AutoMaterializePolicy, DataVersion, Definitions, Failure,
+    multiprocess_executor, Output, RunRequest, StaticPartitionsDefinition
+)
+from icloud import icloud_loader
+from markdown_parsing import paragraphs
+from metrics import pipeline_metrics
+import dagster_main
+import hashlib
+import logging
+import os
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# One partition per note, keyed by its file name
+NOTE_PARTITIONS = StaticPartitionsDefinition([path[-1] for path in dagster_main.NOTE_PATHS])
+NOTE_PATHS_BY_NAME = {path[-1]: path for path in dagster_main.NOTE_PATHS}
+
+# Bump when the computation of an asset changes, Dagster then flags its partitions as stale
+PARSER_VERSION = "1"
+RENDER_VERSION = "1"
+
+# The iCloud session of this process, reused by every partition it materializes
+_icloud_connection = None
+
+
+def get_icloud_connection(config):
+    """Authenticate once per process."""
+    global _icloud_connection
+    if _icloud_connection is None:
+        _icloud_connection = icloud_loader.ICloudConnection(
+            username=config['icloud']['username'], password=config['icloud']['password']
+        )
+    return _icloud_connection
+
+
+def text_hash(values) -> str:
+    """Data version of a list of texts."""
+    digest = hashlib.sha256()
+    for value in values:
+        digest.update(value.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+@asset(partitions_def=NOTE_PARTITIONS, code_version="1", required_resource_keys={"config"})
+def note_content(context):
+    """
+    The Markdown content of a note, downloaded from iCloud when its drive metadata changed and
+    upserted into wizetts.note_content. Its data version is the content hash, so touching a note on
+    iCloud without changing it does not make the downstream partitions stale.
+    """
+    note_name = context.partition_key
+    config = context.resources.config
+    postgres_client = dagster_main.get_postgres_client(config)
+    incremental = dagster_main.is_incremental(config)
+    # Partitions share the table, a non-incremental run reloads its own note instead of dropping the others
+    dagster_main.ensure_note_content_table(postgres_client)
+    known_state = dagster_main.fetch_known_note_states(config).get(note_name) if incremental else None
+
+    recorder = pipeline_metrics.MetricsRecorder()
+    with recorder.timer('download'):
+        note = get_icloud_connection(config).load_file(NOTE_PATHS_BY_NAME[note_name], known_state=known_state)
+    if note is None:
+        raise Failure(description=f"Error loading note {note_name} from iCloud")
+
+    if note['local_path']:
+        try:
+            with open(note['local_path'], 'r') as file:
+                content = file.read()
+        finally:
+            os.remove(note['local_path'])
+        with recorder.timer('db_write'):
+            changed_rows, _ = dagster_main.upsert_notes(postgres_client, [(note, content)], incremental)
+        recorder.set('notes_changed', len(changed_rows))
+    else:
+        context.log.info(f"Note unchanged on iCloud, skipped: {note_name}")
+
+    rows = postgres_client.execute_query(
+        "SELECT content_id, content_hash, content FROM wizetts.note_content WHERE note_name = %s;",
+        params=(note_name,)
+    )
+    if not rows:
+        raise Failure(description=f"Note {note_name} is missing from wizetts.note_content")
+    content_id, content_hash, content = rows[0]
+    summary = dagster_main.emit_metrics(context, config, None, recorder)
+    return Output(
+        {'note_name': note_name, 'content_id': content_id, 'content_hash': content_hash, 'content': content},
+        data_version=DataVersion(content_hash),
+        metadata={'content_id': content_id, **summary}
+    )
+
+
+@asset(partitions_def=NOTE_PARTITIONS, code_version=PARSER_VERSION,
+       auto_materialize_policy=AutoMaterializePolicy.eager())
+def paragraphes(context, note_content):
+    """The raw paragraphs of a note, as split by the paragraphes dbt model."""
+    raw_paragraphs = paragraphs.split_paragraphs(note_content['content'])
+    return Output(
+        {**note_content, 'paragraphs': raw_paragraphs},
+        data_version=DataVersion(text_hash(raw_paragraphs)),
+        metadata={'paragraphs': len(raw_paragraphs)}
+    )
+
+
+@asset(partitions_def=NOTE_PARTITIONS, code_version=PARSER_VERSION, required_resource_keys={"config"},
+       auto_materialize_policy=AutoMaterializePolicy.eager())
+def cleaned_paragraphes(context, paragraphes):
+    """The cleaned paragraphs of a note, also written to wizetts.native_cleaned_paragraphes."""
+    config = context.resources.config
+    note_name = paragraphes['note_name']
+    rows = [(note_name, order, paragraphs.clean_paragraph(paragraph))
+            for order, paragraph in enumerate(paragraphes['paragraphs'], start=1)]
+    paragraphs.write_paragraphs(dagster_main.get_postgres_client(config), [(paragraphes['content_id'], rows)])
+    return Output(
+        {'note_name': note_name, 'content_id': paragraphes['content_id'],
+         'content_hash': paragraphes['content_hash'], 'rows': rows},
+        data_version=DataVersion(text_hash(content for _, _, content in rows)),
+        metadata={'paragraphs': len(rows)}
+    )
+
+
+@asset(partitions_def=NOTE_PARTITIONS, code_version=RENDER_VERSION, required_resource_keys={"config"},
+       auto_materialize_policy=AutoMaterializePolicy.eager())
+def generated_audio(context, cleaned_paragraphes):
+    """The audio files of the paragraphs of a note, only changed paragraphs are synthesized."""
+    config = context.resources.config
+    note_name = cleaned_paragraphes['note_name']
+    # The render state is shared with the op jobs, concurrent partitions only write back their own note
+    processor = dagster_main.build_tts_processor(config)
+
+    with processor.metrics.timer('tts_wall'):
+        total, failed_note_names = processor.render_paragraph_batches([cleaned_paragraphes['rows']])
+    processor.mark_notes_clean([(cleaned_paragraphes['content_id'], cleaned_paragraphes['content_hash'], note_name)],
+                               failed_note_names)
+    processor.finish_run()
+    summary = dagster_main.emit_metrics(context, config, None, processor.metrics)
+    if failed_note_names:
+        raise Failure(description=f"Some paragraphs of {note_name} failed to render", metadata=summary)
+
+    hashes = processor.render_state.get(note_name) or []
+    return Output(
+        [processor.output_filename(note_name, order) for _, order, _ in cleaned_paragraphes['rows']],
+        data_version=DataVersion(text_hash(paragraph_hash or '' for paragraph_hash in hashes)),
+        metadata={'paragraphs': total, **summary}
+    )
+
+
+@asset(partitions_def=NOTE_PARTITIONS, code_version=RENDER_VERSION, required_resource_keys={"config"},
+       auto_materialize_policy=AutoMaterializePolicy.eager())
+def chapter_audio(context, generated_audio):
+    """The paragraphs of a note concatenated into one chapter file, with a JSON index of their offsets."""
+    config = context.resources.config
+    note_name = context.partition_key
+    processor = dagster_main.build_tts_processor(config)
+    dagster_main.assemble_chapters(config, processor, note_names=[note_name])
+    summary = dagster_main.emit_metrics(context, config, None, processor.metrics)
+    if summary.get('chapters_failed'):
+        raise Failure(description=f"The chapter of {note_name} failed to assemble", metadata=summary)
+    return Output(note_name, metadata=summary)
+
+
+# Every asset of the selected notes, e.g. to backfill after bumping a code version
+note_assets_job = define_asset_job(
+    "note_assets_job",
+    selection=[note_content, paragraphes, cleaned_paragraphes, generated_audio, chapter_audio],
+    partitions_def=NOTE_PARTITIONS
+)
+
+# Only the download, downstream partitions follow through their auto-materialize policy when the content changed
+note_content_job = define_asset_job("note_content_job", selection=[note_content], partitions_def=NOTE_PARTITIONS)
+
+
+@schedule(job=note_content_job, cron_schedule="0 * * * *")
+def hourly_note_refresh(context):
+    """Check every note on iCloud each hour, one run per note."""
+    for note_name in NOTE_PARTITIONS.get_partition_keys():
+        yield RunRequest(run_key=None, partition_key=note_name)
+
+
+defs = Definitions(
+    assets=[note_content, paragraphes, cleaned_paragraphes, generated_audio, chapter_audio],
+    jobs=[note_assets_job, note_content_job, dagster_main.dagster_flow, dagster_main.dagster_native_flow,
+          dagster_main.dagster_rerender_flow],
+    schedules=[hourly_note_refresh],
+    resources=dagster_main.RESOURCES,
+    executor=multiprocess_executor
+)
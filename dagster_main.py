@@ -1,9 +1,14 @@
-from dagster import job, op, In, Out
+from dagster import job, op, resource, Definitions, Field, In, Out, AssetMaterialization
 from icloud import icloud_loader
 from postgres import postgres
 from TTS_gtts import text_to_speech
+from TTS_gtts import backends
+from TTS_gtts import normalization
+from TTS_gtts import render_queue
+from markdown_parsing import paragraphs
+from metrics import pipeline_metrics
 import os
-import pandas as pd
+import hashlib
 import logging
 import yaml
 import glob
@@ -12,26 +17,238 @@ import glob
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(asctime)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-def load_config():
+# iCloud Drive paths of the notes to render
+NOTE_PATHS = [
+    ['Obsidian', 'WizeCosm', '04 - Arcs', '01 - Phase 1', 'Phase 1 - les Séquelles de la guerre.md'],
+    ['Obsidian', 'WizeCosm', '04 - Arcs', '02 - Phase 2', 'Phase 2 - Mia.md'],
+    ['Obsidian', 'WizeCosm', '04 - Arcs', '03 - Phase 3', 'Phase 3 - La pluie d\'étoiles.md'],
+    ['Obsidian', 'WizeCosm', '04 - Arcs', '04 - Phase 4', 'Phase 4 - L\'équipage.md'],
+    ['Obsidian', 'WizeCosm', '04 - Arcs', '05 - Arc 1', 'PART 01', 'Partie 1 - La traversée.md'],
+    ['Obsidian', 'WizeCosm', '04 - Arcs', '05 - Arc 1', 'PART 02', 'Partie 2 - la découverte des îles.md'],
+    ['Obsidian', 'WizeCosm', '04 - Arcs', '05 - Arc 1', 'PART 03', 'Partie 3 - Rencontre équipages Yamés ¦ Gamé.md']
+    ]
+
+CONFIG_PATH = 'config/conf.yaml'
+
+def load_config(path=CONFIG_PATH):
     """Load configuration from a YAML file."""
     logger.info("Loading configuration from YAML.")
-    with open('config/conf.yaml', 'r') as file:
+    with open(path, 'r') as file:
         config = yaml.safe_load(file)
     logger.info("Configuration loaded successfully.")
     return config
 
-@op(out={"result": Out()})
-def test_postgres_connection(context):
-    """Step 2: Test connection to PostgreSQL."""
-    logger.info("Testing PostgreSQL connection.")
-    config = load_config()
-    postgres_client = postgres.PostgresClient(
+@resource(config_schema={"path": Field(str, default_value=CONFIG_PATH, is_required=False)})
+def pipeline_config(init_context):
+    """The configuration, read once per run (once per step process with the multiprocess executor)."""
+    return load_config(init_context.resource_config["path"])
+
+RESOURCES = {"config": pipeline_config}
+
+def get_postgres_client(config):
+    """Build a PostgresClient, clients with the same settings share one connection pool."""
+    return postgres.PostgresClient(
         host=config['postgresql']['host'],
         port=config['postgresql']['port'],
         database=config['postgresql']['database'],
         user=config['postgresql']['user'],
-        password=config['postgresql']['password']
+        password=config['postgresql']['password'],
+        min_connections=config['postgresql'].get('pool_min_connections', 1),
+        max_connections=config['postgresql'].get('pool_max_connections', 5)
+    )
+
+def build_tts_processor(config):
+    """Build the TTSProcessor described by the tts section of the configuration."""
+    db_params = {
+        "host": config['postgresql']['host'],
+        "port": config['postgresql']['port'],
+        "database": config['postgresql']['database'],
+        "user": config['postgresql']['user'],
+        "password": config['postgresql']['password']
+    }
+    output_dir = "generated_audio"
+    tts_config = config.get('tts', {})
+    backend_name = tts_config.get('backend', 'gtts')
+    backend = backends.create_backend(backend_name, lang='fr', **tts_config.get(backend_name, {}))
+    lexicon_path = tts_config.get('lexicon_path', normalization.DEFAULT_LEXICON_PATH)
+    normalizer = None
+    if lexicon_path and os.path.exists(lexicon_path):
+        normalizer = normalization.TextNormalizer.from_file(lexicon_path)
+    elif lexicon_path:
+        logger.warning(f"Lexicon {lexicon_path} not found, paragraphs are synthesized as cleaned by dbt.")
+    queue_config = tts_config.get('queue', {})
+    job_queue = None
+    if queue_config.get('enabled', True):
+        job_queue = render_queue.RenderQueue(
+            get_postgres_client(config),
+            lease_seconds=queue_config.get('lease_seconds', 900),
+            max_attempts=queue_config.get('max_attempts', 5),
+            retry_backoff_seconds=queue_config.get('retry_backoff_seconds', 30.0)
+        )
+    return text_to_speech.TTSProcessor(
+        db_params=db_params,
+        output_dir=output_dir,
+        backend=backend,
+        cache_dir=tts_config.get('cache_dir', '.tts_cache'),
+        cache_max_size_mb=tts_config.get('cache_max_size_mb'),
+        cache_max_age_days=tts_config.get('cache_max_age_days'),
+        max_workers=tts_config.get('max_workers', 4),
+        requests_per_second=tts_config.get('requests_per_second', 2),
+        max_retries=tts_config.get('max_retries', 3),
+        retry_backoff_seconds=tts_config.get('retry_backoff_seconds', 2.0),
+        max_chunk_chars=tts_config.get('max_chunk_chars', 400),
+        dirty_only=is_incremental(config),
+        job_queue=job_queue,
+        normalizer=normalizer
+    )
+
+def assemble_chapters(config, processor, note_names=None, force=False):
+    """Assemble the chapter files described by the chapters section of the configuration."""
+    chapters_config = config.get('chapters', {})
+    if not chapters_config.get('enabled', True):
+        return 0
+    return processor.assemble_chapters(
+        chapters_config.get('output_dir', 'generated_chapters'),
+        opus_bitrate=chapters_config.get('opus_bitrate'),
+        note_names=note_names,
+        force=force
     )
+
+def rerender_selection(config, query=None, note_names=None, first_order=None, last_order=None,
+                       force=True, native=False, dry_run=False):
+    """
+    Re-render only the paragraphs matching a full-text query, notes and order range, then their chapters.
+    :param native: Select from wizetts.native_cleaned_paragraphes instead of the dbt model
+    :param dry_run: Only return the selection
+    :return: (processor, selected rows, output filenames that failed)
+    """
+    processor = build_tts_processor(config)
+    table = paragraphs.NATIVE_TABLE if native else 'wizetts.cleaned_paragraphes'
+    rows = processor.search_paragraphs(query=query, note_names=note_names, first_order=first_order,
+                                       last_order=last_order, table=table)
+    if dry_run or not rows:
+        return processor, rows, []
+    failed = processor.rerender_paragraphs(rows, force=force)
+    processor.finish_run()
+    assemble_chapters(config, processor, note_names=sorted({row[0] for row in rows}), force=True)
+    return processor, rows, failed
+
+def ensure_note_content_table(postgres_client, incremental=True):
+    """
+    Create wizetts.note_content, or add the columns missing from a table created by an earlier version.
+    :param incremental: Keep the existing rows, otherwise the table is dropped and created again
+    """
+    drop_statement = "" if incremental else "DROP TABLE IF EXISTS wizetts.note_content;"
+    query = f"""
+    {drop_statement}
+    CREATE TABLE IF NOT EXISTS wizetts.note_content (
+        note_name text,
+        content_id serial PRIMARY KEY,
+        content text,
+        created_at timestamp default CURRENT_TIMESTAMP,
+        CONSTRAINT note_name_unique UNIQUE (note_name)
+    );
+
+    -- Change detection columns, added in place on tables created by earlier versions
+    ALTER TABLE wizetts.note_content
+        ADD COLUMN IF NOT EXISTS date_modified timestamp,
+        ADD COLUMN IF NOT EXISTS size bigint,
+        ADD COLUMN IF NOT EXISTS etag text,
+        ADD COLUMN IF NOT EXISTS content_hash text,
+        ADD COLUMN IF NOT EXISTS content_updated_at timestamp default CURRENT_TIMESTAMP,
+        ADD COLUMN IF NOT EXISTS is_dirty boolean NOT NULL default true;
+    
+    ALTER TABLE wizetts.note_content OWNER TO dr0ant;
+    
+    CREATE INDEX IF NOT EXISTS idx_content_id ON wizetts.note_content(content_id);
+    """
+    # In a transaction so that errors are raised instead of logged
+    with postgres_client.transaction():
+        postgres_client.execute_query(query, fetch=False)
+
+def upsert_notes(postgres_client, notes, incremental=True):
+    """
+    Upsert downloaded notes in one transaction and flag the ones whose content changed as dirty.
+    :param notes: List of (metadata returned by ICloudConnection.load_file, content)
+    :param incremental: Compare with the stored content hashes, otherwise every note counts as changed
+    :return: (changed rows, metadata-only rows)
+    """
+    known_hashes = {}
+    if incremental:
+        rows = postgres_client.execute_query("SELECT note_name, content_hash FROM wizetts.note_content;") or []
+        known_hashes = dict(rows)
+
+    changed_rows = []
+    metadata_rows = []
+    for note, content in notes:
+        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        metadata = (note['note_name'], note['date_modified'], note['size'], note['etag'])
+        if known_hashes.get(note['note_name']) == content_hash:
+            metadata_rows.append(metadata)  # Touched on iCloud but same content
+        else:
+            changed_rows.append(metadata + (content, content_hash))
+
+    with postgres_client.transaction():
+        postgres_client.bulk_upsert(
+            'wizetts.note_content',
+            ['note_name', 'date_modified', 'size', 'etag', 'content', 'content_hash'],
+            changed_rows,
+            conflict_columns=['note_name']
+        )
+        postgres_client.bulk_upsert(
+            'wizetts.note_content',
+            ['note_name', 'date_modified', 'size', 'etag'],
+            metadata_rows,
+            conflict_columns=['note_name']
+        )
+        # Flag changed notes for the downstream dbt models and TTS step
+        if changed_rows:
+            postgres_client.execute_query(
+                """
+                UPDATE wizetts.note_content
+                SET is_dirty = true, content_updated_at = CURRENT_TIMESTAMP
+                WHERE note_name = ANY(%s);
+                """,
+                params=([row[0] for row in changed_rows],),
+                fetch=False
+            )
+    return changed_rows, metadata_rows
+
+def emit_metrics(context, config, asset_key, recorder):
+    """
+    Publish the metrics of an op as asset materialization metadata and to the local metrics sink.
+    Assets pass asset_key=None and attach the returned summary to their own Output instead.
+    """
+    summary = {name: value for name, value in recorder.summary().items() if value is not None}
+    if asset_key is not None:
+        context.log_event(AssetMaterialization(asset_key=asset_key, metadata=summary))
+    metrics_dir = config.get('metrics', {}).get('dir', 'metrics_output')
+    try:
+        pipeline_metrics.write_metrics(metrics_dir, context.run_id, context.op_def.name, summary)
+    except OSError as e:
+        context.log.error(f"Error writing metrics to {metrics_dir}: {e}")
+    return summary
+
+def is_incremental(config):
+    """Incremental runs keep note_content and only process notes changed since the last run."""
+    return config.get('pipeline', {}).get('incremental', True)
+
+def fetch_known_note_states(config):
+    """Return the drive metadata recorded for each note, keyed by note name."""
+    postgres_client = get_postgres_client(config)
+    query = "SELECT note_name, date_modified, size, etag FROM wizetts.note_content;"
+    rows = postgres_client.execute_query(query) or []
+    return {
+        note_name: {"date_modified": date_modified, "size": size, "etag": etag}
+        for note_name, date_modified, size, etag in rows
+    }
+
+@op(out={"result": Out()}, required_resource_keys={"config"})
+def test_postgres_connection(context):
+    """Step 2: Test connection to PostgreSQL."""
+    logger.info("Testing PostgreSQL connection.")
+    config = context.resources.config
+    postgres_client = get_postgres_client(config)
     query = "SELECT 1;"
     result = postgres_client.execute_query(query)
     if result:
@@ -41,95 +258,79 @@ def test_postgres_connection(context):
         context.log.error("PostgreSQL connection failed.")
         return "failed"
 
-@op(out={"local_files": Out()})
+@op(out={"local_files": Out()}, required_resource_keys={"config"})
 def load_icloud_files(context):
     """Step 3: Load iCloud files locally."""
     logger.info("Loading files from iCloud.")
-    config = load_config()  # Load the configuration
+    config = context.resources.config
     username = config['icloud']['username']
     password = config['icloud']['password']
     
-    # List of file paths to be loaded
-    file_paths = [
-        ['Obsidian', 'WizeCosm', '04 - Arcs', '01 - Phase 1', 'Phase 1 - les Séquelles de la guerre.md'],
-        ['Obsidian', 'WizeCosm', '04 - Arcs', '02 - Phase 2', 'Phase 2 - Mia.md'],
-        ['Obsidian', 'WizeCosm', '04 - Arcs', '03 - Phase 3', 'Phase 3 - La pluie d\'étoiles.md'],
-        ['Obsidian', 'WizeCosm', '04 - Arcs', '04 - Phase 4', 'Phase 4 - L\'équipage.md'],
-        ['Obsidian', 'WizeCosm', '04 - Arcs', '05 - Arc 1', 'PART 01', 'Partie 1 - La traversée.md'],
-        ['Obsidian', 'WizeCosm', '04 - Arcs', '05 - Arc 1', 'PART 02', 'Partie 2 - la découverte des îles.md'],
-        ['Obsidian', 'WizeCosm', '04 - Arcs', '05 - Arc 1', 'PART 03', 'Partie 3 - Rencontre équipages Yamés ¦ Gamé.md']
-    ]
+    # State recorded by the previous run, used to skip unchanged notes
+    known_states = fetch_known_note_states(config) if is_incremental(config) else {}
 
-    
     local_files = []
-    
-    for path in file_paths:
-        try:
-            # Create the ICloudConnection instance with the current path
-            icloud_conn = icloud_loader.ICloudConnection(username=username, password=password, drive_file=path)
-            icloud_conn.load_md_files()  # Load the file from iCloud
-            
-            # Assuming tmp_md folder is the destination
-            local_file_path = f"tmp_md/{'/'.join(path)}"
-            local_files.append(local_file_path)  # Store the local path
-            
-            context.log.info(f"File loaded: {local_file_path}")
-        except Exception as e:
-            context.log.error(f"Error loading file {path}: {e}")
+
+    try:
+        # One authenticated session for every file
+        icloud_conn = icloud_loader.ICloudConnection(username=username, password=password)
+    except Exception as e:
+        context.log.error(f"Error connecting to iCloud: {e}")
+        return local_files
+
+    recorder = pipeline_metrics.MetricsRecorder()
+    max_workers = config['icloud'].get('max_concurrent_downloads', 4)
+    with recorder.timer('download'):
+        notes = icloud_conn.load_many(NOTE_PATHS, known_states=known_states, max_workers=max_workers)
+    downloaded = [note for note in notes if note and note['local_path']]
+    recorder.set('files_downloaded', len(downloaded))
+    recorder.set('files_skipped', sum(1 for note in notes if note and not note['local_path']))
+    recorder.set('files_failed', sum(1 for note in notes if note is None))
+    recorder.set('download_bytes', sum(note['size'] or 0 for note in downloaded))
+    recorder.rate('download_bytes_per_second', 'download_bytes', 'download_seconds')
+    emit_metrics(context, config, 'note_files', recorder)
+    for path, note in zip(NOTE_PATHS, notes):
+        if note is None:
+            context.log.error(f"Error loading file {'/'.join(path)}")
+            continue
+        local_files.append(note)  # Store the note metadata and local path
+
+        if note['local_path']:
+            context.log.info(f"File loaded: {note['local_path']}")
+        else:
+            context.log.info(f"File unchanged, skipped: {note['note_name']}")
     
     return local_files
 
-@op(ins={"start_signal": In()}, out={"result": Out()})
+@op(ins={"start_signal": In()}, out={"result": Out()}, required_resource_keys={"config"})
 def create_postgres_table(context, start_signal):
-    """Step 4: Drop the table if it exists and create it."""
+    """Step 4: Create the table, dropping it first unless the run is incremental."""
     logger.info("Creating PostgreSQL table if it doesn't exist.")
-    config = load_config()
-    postgres_client = postgres.PostgresClient(
-        host=config['postgresql']['host'],
-        port=config['postgresql']['port'],
-        database=config['postgresql']['database'],
-        user=config['postgresql']['user'],
-        password=config['postgresql']['password']
-    )
+    config = context.resources.config
+    postgres_client = get_postgres_client(config)
 
-    query = """
-    DROP TABLE IF EXISTS wizetts.note_content;
-    CREATE TABLE IF NOT EXISTS wizetts.note_content (
-        note_name text,
-        content_id serial PRIMARY KEY,
-        content text,
-        created_at timestamp default CURRENT_TIMESTAMP
-    );
-    
-    ALTER TABLE wizetts.note_content OWNER TO dr0ant;
-    
-    CREATE INDEX IF NOT EXISTS idx_content_id ON wizetts.note_content(content_id);
-    
-    ALTER TABLE wizetts.note_content ADD CONSTRAINT note_name_unique UNIQUE (note_name);
-    """
     try:
-        postgres_client.execute_query(query, fetch=False)
+        ensure_note_content_table(postgres_client, is_incremental(config))
         context.log.info("PostgreSQL table created successfully.")
         return "ok"
     except Exception as e:
         context.log.error(f"Error creating table: {e}")
         return "failed"
 
-@op(ins={"local_files": In(), "start_signal": In()}, out={"result": Out()})
+@op(ins={"local_files": In(), "start_signal": In()}, out={"result": Out()}, required_resource_keys={"config"})
 def load_files_to_postgres(context, local_files, start_signal):
     """Step 5: Load files into PostgreSQL."""
     logger.info("Loading files to PostgreSQL.")
-    config = load_config()
-    postgres_client = postgres.PostgresClient(
-        host=config['postgresql']['host'],
-        port=config['postgresql']['port'],
-        database=config['postgresql']['database'],
-        user=config['postgresql']['user'],
-        password=config['postgresql']['password']
-    )
+    config = context.resources.config
+    postgres_client = get_postgres_client(config)
 
+    file_path = None
     try:
-        for file_path in local_files:
+        notes = []
+        for note in local_files:
+            file_path = note['local_path']
+            if not file_path:
+                continue  # Unchanged on iCloud, nothing was downloaded
             # Extract just the file name from the full path
             file_name = os.path.basename(file_path)
             local_file_path = os.path.join("tmp_md", file_name)  # Full path to the file in tmp_md directory
@@ -138,22 +339,20 @@ def load_files_to_postgres(context, local_files, start_signal):
             
             # Read the content of the file
             with open(local_file_path, 'r') as file:
-                content = file.read()
-
-            # Create DataFrame to upsert into PostgreSQL
-            df = pd.DataFrame([{'note_name': file_name, 'content': content}])
-
-            # Insert or update into PostgreSQL
-            for index, row in df.iterrows():
-                query = """
-                INSERT INTO wizetts.note_content (note_name, content)
-                VALUES (%s, %s)
-                ON CONFLICT (note_name) DO UPDATE 
-                SET content = EXCLUDED.content;
-                """
-                postgres_client.execute_query(query, params=(row['note_name'], row['content']), fetch=False)
+                notes.append((note, file.read()))
+
+        # Insert or update every note in a single transaction
+        recorder = pipeline_metrics.MetricsRecorder()
+        with recorder.timer('db_write'):
+            changed_rows, metadata_rows = upsert_notes(postgres_client, notes, is_incremental(config))
 
-            context.log.info(f"Successfully upserted file {file_name}.")
+        recorder.set('db_rows', len(changed_rows) + len(metadata_rows))
+        recorder.set('notes_changed', len(changed_rows))
+        recorder.rate('db_rows_per_second', 'db_rows', 'db_write_seconds')
+        emit_metrics(context, config, 'note_content', recorder)
+
+        context.log.info(f"Successfully upserted {len(changed_rows)} changed files, "
+                         f"{len(local_files) - len(changed_rows)} unchanged.")
         return "ok"
     except Exception as e:
         context.log.error(f"Error processing file {file_path}: {e}")
@@ -197,7 +396,7 @@ def delete_tmp_md(context, start_signal):
         return "failed"
 
 
-@op(ins={"start_signal": In()}, out={"result": Out()})
+@op(ins={"start_signal": In()}, out={"result": Out()}, required_resource_keys={"config"})
 def launch_dbt_model(context, start_signal):
     """Step 7: Launch the dbt model and generate docs."""
     logger.info("Launching dbt model and generating docs...")
@@ -205,8 +404,23 @@ def launch_dbt_model(context, start_signal):
         # Define the dbt project directory (replace with your actual path)
         dbt_dir = 'wize_tts_dbt'
         
-        # Run the dbt model
-        os.system(f"cd {dbt_dir} && dbt run")
+        # Run the dbt model, incremental models only rebuild changed notes unless the
+        # note_content table was recreated (content ids changed) or a full refresh is requested
+        config = context.resources.config
+        full_refresh = not is_incremental(config) or config.get('dbt', {}).get('full_refresh', False)
+        recorder = pipeline_metrics.MetricsRecorder()
+        with recorder.timer('dbt_run'):
+            exit_status = os.system(f"cd {dbt_dir} && dbt run{' --full-refresh' if full_refresh else ''}")
+        if exit_status != 0:
+            # The paragraph tables are stale, rendering them would clear the dirty flags of unrendered edits
+            context.log.error(f"dbt run failed with exit status {exit_status}.")
+            return "failed"
+
+        # Read the model durations before dbt docs generate overwrites run_results.json
+        run_results_path = os.path.join(dbt_dir, 'target', 'run_results.json')
+        for model_name, execution_time in pipeline_metrics.dbt_model_timings(run_results_path).items():
+            recorder.set(f"dbt_{model_name}_seconds", execution_time)
+        emit_metrics(context, config, 'cleaned_paragraphes', recorder)
         
         # Generate dbt docs
         os.system(f"cd {dbt_dir} && dbt docs generate")
@@ -237,24 +451,108 @@ def launch_dbt_model(context, start_signal):
         return "failed"
 
 
-@op(ins={"start_signal": In()})
+@op(ins={"start_signal": In()}, required_resource_keys={"config"})
 def generate_audio(context, start_signal):
     """Step 8: Generate audio from text and save it as an MP3 file."""
     logger.info("Generating audio from text.")
-    config = load_config()
-    db_params = {
-        "host": config['postgresql']['host'],
-        "port": config['postgresql']['port'],
-        "database": config['postgresql']['database'],
-        "user": config['postgresql']['user'],
-        "password": config['postgresql']['password']
-    }
-    output_dir = "generated_audio"
-    processor = text_to_speech.TTSProcessor(
-        db_params=db_params,
-        output_dir=output_dir
+    if start_signal != "ok":
+        context.log.error("The paragraph models were not built, audio not generated and dirty notes kept.")
+        return
+    config = context.resources.config
+    tts_config = config.get('tts', {})
+    processor = build_tts_processor(config)
+    processor.generate_audio_for_paragraphs(
+        stream=tts_config.get('stream', True),
+        batch_size=tts_config.get('fetch_batch_size', 200)
     )
-    processor.generate_audio_for_paragraphs()
+    assemble_chapters(config, processor)
+    emit_metrics(context, config, 'generated_audio', processor.metrics)
+
+@op(ins={"start_signal": In()}, out={"result": Out()}, required_resource_keys={"config"})
+def check_markdown_parity(context, start_signal):
+    """Step 9 (optional): Compare the in-process Markdown parser with the dbt models."""
+    config = context.resources.config
+    if not config.get('pipeline', {}).get('check_parity', False):
+        return "skipped"
+    mismatches = paragraphs.check_parity(get_postgres_client(config))
+    for note_name, order, python_content, dbt_content in mismatches[:20]:
+        context.log.warning(f"{note_name} #{order}: python={python_content!r} dbt={dbt_content!r}")
+    return "ok" if not mismatches else "failed"
+
+@op(ins={"local_files": In(), "start_signal": In()}, out={"result": Out()}, required_resource_keys={"config"})
+def parse_and_generate_audio(context, local_files, start_signal):
+    """
+    Native step: Parse the downloaded notes in-process and generate their audio, without dbt.
+    Notes still dirty from an earlier run (e.g. paragraphs that failed) are rendered again even though
+    iCloud has nothing new for them.
+    """
+    logger.info("Parsing notes in-process and generating audio.")
+    config = context.resources.config
+    postgres_client = get_postgres_client(config)
+
+    note_names = [note['note_name'] for note in local_files if note['local_path']]
+    try:
+        # The downloaded notes were upserted by load_files_to_postgres, the table holds their current content
+        rows = postgres_client.execute_query(
+            """
+            SELECT content_id, content_hash, note_name, content FROM wizetts.note_content
+            WHERE note_name = ANY(%s) OR is_dirty
+            ORDER BY note_name;
+            """,
+            params=(note_names,)
+        ) or []
+        if not rows:
+            context.log.info("No note downloaded or left dirty, nothing to render.")
+            return "ok"
+        notes = [(content_id, content_hash, note_name, list(paragraphs.parse_note(note_name, content)))
+                 for content_id, content_hash, note_name, content in rows]
+
+        paragraphs.write_paragraphs(postgres_client, [(content_id, note_rows)
+                                                      for content_id, _, _, note_rows in notes])
+
+        processor = build_tts_processor(config)
+        with processor.metrics.timer('tts_wall'):
+            total, failed_note_names = processor.render_paragraph_batches(note_rows for *_, note_rows in notes)
+        processor.mark_notes_clean([(content_id, content_hash, note_name)
+                                    for content_id, content_hash, note_name, _ in notes], failed_note_names)
+        processor.finish_run()
+        assemble_chapters(config, processor)
+        emit_metrics(context, config, 'generated_audio', processor.metrics)
+        context.log.info(f"Rendered {total} paragraphs of {len(notes)} notes, "
+                         f"{len(failed_note_names)} notes with failures.")
+        return "ok" if not failed_note_names else "failed"
+    except Exception as e:
+        context.log.error(f"Error parsing and rendering notes: {e}")
+        return "failed"
+
+@op(
+    config_schema={
+        "query": Field(str, is_required=False, description="Full-text query in web-search syntax, e.g. Mia -Gamé"),
+        "notes": Field([str], is_required=False, description="Note names or ILIKE patterns"),
+        "first_order": Field(int, is_required=False),
+        "last_order": Field(int, is_required=False),
+        "force": Field(bool, default_value=True, description="Synthesize again even if the audio is cached"),
+        "native": Field(bool, default_value=False, description="Select from the native paragraph table"),
+    },
+    out={"result": Out()},
+    required_resource_keys={"config"}
+)
+def rerender_selected_paragraphs(context):
+    """Targeted step: Re-render the paragraphs selected by the op config."""
+    config = context.resources.config
+    selection = context.op_config
+    processor, rows, failed = rerender_selection(
+        config,
+        query=selection.get("query"),
+        note_names=selection.get("notes"),
+        first_order=selection.get("first_order"),
+        last_order=selection.get("last_order"),
+        force=selection["force"],
+        native=selection["native"]
+    )
+    emit_metrics(context, config, 'generated_audio', processor.metrics)
+    context.log.info(f"Re-rendered {len(rows) - len(failed)} of {len(rows)} selected paragraphs.")
+    return "ok" if not failed else "failed"
 
 @job
 def dagster_flow():
@@ -269,5 +567,23 @@ def dagster_flow():
     delete_tmp_md_result = delete_tmp_md(start_signal=loaded_files_result)
     dbt_launched_result = launch_dbt_model(start_signal=delete_tmp_md_result)
     generate_audio(start_signal=dbt_launched_result)
+    check_markdown_parity(start_signal=dbt_launched_result)
     
     logger.info("Dagster flow completed.")
+
+@job
+def dagster_native_flow():
+    """Flow parsing the notes in-process instead of going through dbt."""
+    local_files = load_icloud_files()
+    conn_result = test_postgres_connection()
+    create_table_result = create_postgres_table(start_signal=conn_result)
+    loaded_files_result = load_files_to_postgres(local_files, start_signal=create_table_result)
+    rendered_result = parse_and_generate_audio(local_files, start_signal=loaded_files_result)
+    delete_tmp_md(start_signal=rendered_result)
+
+@job
+def dagster_rerender_flow():
+    """Flow re-rendering a selection of paragraphs, configured through the op config."""
+    rerender_selected_paragraphs()
+
+defs = Definitions(jobs=[dagster_flow, dagster_native_flow, dagster_rerender_flow], resources=RESOURCES)
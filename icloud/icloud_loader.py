@@ -1,6 +1,7 @@
 import logging
 import os
-from pyicloud import PyiCloudService
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from shutil import copyfileobj
 
 # Configure logging
@@ -8,9 +9,13 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 class ICloudConnection:
-    def __init__(self, username, password, drive_file):
+    def __init__(self, username, password, drive_file=None):
         """Initialize connection to iCloud and handle 2FA if required."""
         self.drive_file = drive_file  # Store the specific drive file structure
+        self._nodes = {}  # Drive nodes already resolved, keyed by path prefix
+        self._nodes_lock = threading.Lock()
+        from pyicloud import PyiCloudService  # Heavy, only imported by the steps that talk to iCloud
+
         logger.info(f"Initializing iCloud connection for user: {username}")
         try:
             self.icloud = PyiCloudService(username, password)
@@ -55,12 +60,39 @@ class ICloudConnection:
             logger.error(f"Error during 2SA: {e}")
             raise
 
-    def load_md_files(self):
-        """Load multiple files based on the provided drive_file structure."""
+    def load_md_files(self, known_state=None):
+        """
+        Load the file based on the provided drive_file structure.
+        :param known_state: Metadata recorded by the previous run (date_modified, size, etag),
+                            the download is skipped when the drive item still matches it
+        :return: Dict with the file metadata and its local_path (None when skipped), or None on error
+        """
+        return self.load_file(self.drive_file, known_state)
+
+    def load_many(self, paths, known_states=None, max_workers=4):
+        """
+        Load several files over this authenticated session with a bounded pool of downloads.
+        :param paths: List of path parts lists, one per file
+        :param known_states: Dict of known_state keyed by file name
+        :param max_workers: Number of concurrent downloads
+        :return: List of load_file results, aligned with paths
+        """
+        known_states = known_states or {}
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = [executor.submit(self.load_file, path, known_states.get(path[-1])) for path in paths]
+            return [future.result() for future in futures]
+
+    def load_file(self, path, known_state=None):
+        """
+        Load one file from the drive into tmp_md.
+        :param path: List of folder names ending with the file name
+        :param known_state: Metadata recorded by the previous run, see load_md_files
+        :return: Dict with the file metadata and its local_path (None when skipped), or None on error
+        """
         try:
-            logger.info(f"Attempting to fetch file: {self.drive_file}")
+            logger.info(f"Attempting to fetch file: {path}")
             # Navigate through the directories to the file
-            drive_file = self._navigate_to_file(self.drive_file)
+            drive_file = self._navigate_to_file(path)
             
             if drive_file:
                 logger.info(f"File found: {drive_file.name}")
@@ -68,22 +100,54 @@ class ICloudConnection:
                 logger.info(f"File size: {drive_file.size} bytes")
                 logger.info(f"File type: {drive_file.type}")
 
+                metadata = {
+                    "note_name": drive_file.name,
+                    "date_modified": drive_file.date_modified,
+                    "size": drive_file.size,
+                    "etag": (getattr(drive_file, "data", None) or {}).get("etag"),
+                    "local_path": None,
+                }
+                if self._is_unchanged(metadata, known_state):
+                    logger.info(f"File {drive_file.name} unchanged since last run, skipping download.")
+                    return metadata
+
                 # Download the file to the tmp_md directory
-                content = self._download_file(drive_file)
-                logger.info(f"File Content (Preview): {content[:200]}...\n")
+                metadata["local_path"] = self._download_file(drive_file)
+                return metadata
             else:
-                logger.error(f"File not found at the specified path: {self.drive_file}")
+                logger.error(f"File not found at the specified path: {path}")
 
         except Exception as e:
             logger.error(f"Error during loading file: {e}")
+        return None
+
+    @staticmethod
+    def _is_unchanged(metadata, known_state):
+        """Compare the drive item with the state recorded by the previous run."""
+        if not known_state:
+            return False
+        if metadata["etag"] and known_state.get("etag"):
+            return metadata["etag"] == known_state["etag"]
+        return (metadata["date_modified"] == known_state.get("date_modified")
+                and metadata["size"] == known_state.get("size"))
 
     def _navigate_to_file(self, path_parts):
-        """Navigate through the iCloud drive structure based on the provided path."""
+        """
+        Navigate through the iCloud drive structure based on the provided path.
+        Folders are resolved once and reused by every file sharing them.
+        """
         try:
             drive_file = self.drive
-            for part in path_parts:
-                drive_file = drive_file[part]  # Navigate to the next directory/file
-            return drive_file
+            for depth in range(1, len(path_parts)):
+                prefix = tuple(path_parts[:depth])
+                with self._nodes_lock:
+                    node = self._nodes.get(prefix)
+                    if node is None:
+                        node = drive_file[path_parts[depth - 1]]  # Navigate to the next directory
+                        self._nodes[prefix] = node
+                drive_file = node
+            # The file node itself is not cached so its metadata is always fresh
+            return drive_file[path_parts[-1]]
         except KeyError:
             logger.error(f"Invalid path or directory: {'/'.join(path_parts)}")
             return None
@@ -0,0 +1,115 @@
+import logging
+import re
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Same rules as wize_tts_dbt/models/markdown_file_treatment/paragraphes.sql and cleaned_paragraphes.sql
+PARAGRAPH_SEPARATOR = '\n\n'
+CURLY_QUOTES = str.maketrans('“”', '""')
+# Postgres '\s' follows the C library's iswspace, which leaves no-break spaces alone
+WHITESPACE = re.compile(r'[^\S\xa0\u2007\u202f\x85]+')
+
+NATIVE_TABLE = 'wizetts.native_cleaned_paragraphes'
+
+
+def split_paragraphs(content: str):
+    """
+    Splits a note into raw paragraphs, like REGEXP_SPLIT_TO_TABLE(content, E'\\n\\n').
+    :param content: The Markdown content of the note
+    :return: List of paragraphs, empty ones included, in order
+    """
+    return content.split(PARAGRAPH_SEPARATOR)
+
+
+def clean_paragraph(text: str) -> str:
+    """
+    Applies the cleaning of cleaned_paragraphes.sql: straight quotes, tripled quotes to «,
+    no "* * *" separators, collapsed whitespace and no underscores.
+    :param text: A raw paragraph
+    :return: The cleaned paragraph
+    """
+    text = text.translate(CURLY_QUOTES).replace('"""', '«').replace('* * *', '')
+    return WHITESPACE.sub(' ', text).replace('_', '')
+
+
+def parse_note(note_name: str, content: str):
+    """
+    Splits and cleans a note.
+    :param note_name: Name of the note
+    :param content: The Markdown content of the note
+    :return: Generator of (note_name, paragrapge_order, content) rows, orders starting at 1
+    """
+    for order, paragraph in enumerate(split_paragraphs(content), start=1):
+        yield note_name, order, clean_paragraph(paragraph)
+
+
+def write_paragraphs(postgres_client, notes):
+    """
+    Replaces the paragraphs of the given notes in wizetts.native_cleaned_paragraphes, in one transaction.
+    :param postgres_client: A postgres.PostgresClient
+    :param notes: List of (content_id, rows) with rows as returned by parse_note
+    :return: Number of paragraphs written
+    """
+    rows = [(note_name, content_id, order, content)
+            for content_id, note_rows in notes
+            for note_name, order, content in note_rows]
+    with postgres_client.transaction():
+        postgres_client.execute_query(f"""
+        CREATE TABLE IF NOT EXISTS {NATIVE_TABLE} (
+            note_name text,
+            content_id integer,
+            paragrapge_order integer,
+            content text,
+            update_date timestamptz default NOW(),
+            PRIMARY KEY (content_id, paragrapge_order)
+        );
+
+        -- Same French full-text index as the cleaned_paragraphes dbt model
+        CREATE INDEX IF NOT EXISTS native_cleaned_paragraphes_content_fts
+            ON {NATIVE_TABLE} USING GIN (to_tsvector('french', content));
+        """, fetch=False)
+        postgres_client.execute_query(
+            f"DELETE FROM {NATIVE_TABLE} WHERE content_id = ANY(%s);",
+            params=([content_id for content_id, _ in notes],),
+            fetch=False
+        )
+        postgres_client.execute_many(
+            f"INSERT INTO {NATIVE_TABLE} (note_name, content_id, paragrapge_order, content) VALUES %s",
+            rows
+        )
+    logger.info(f"Wrote {len(rows)} paragraphs of {len(notes)} notes to {NATIVE_TABLE}.")
+    return len(rows)
+
+
+def check_parity(postgres_client, note_names=None):
+    """
+    Compares the Python parsing with the dbt models on the notes stored in wizetts.note_content.
+    :param postgres_client: A postgres.PostgresClient
+    :param note_names: Restrict the check to these notes, all notes by default
+    :return: List of (note_name, paragrapge_order, python_content, dbt_content) mismatches
+    """
+    where = "WHERE nc.note_name = ANY(%s)" if note_names else ""
+    params = (list(note_names),) if note_names else None
+    notes = postgres_client.execute_query(
+        f"SELECT nc.note_name, nc.content FROM wizetts.note_content AS nc {where};", params=params
+    ) or []
+    dbt_rows = postgres_client.execute_query(f"""
+        SELECT cp.note_name, cp.paragrapge_order, cp.content
+        FROM wizetts.cleaned_paragraphes AS cp
+        JOIN wizetts.note_content AS nc ON nc.content_id = cp.content_id
+        {where};
+        """, params=params) or []
+    expected = {(note_name, order): content for note_name, order, content in dbt_rows}
+
+    mismatches = []
+    for note_name, content in notes:
+        python_rows = {(name, order): text for name, order, text in parse_note(note_name, content)}
+        for key in sorted(set(python_rows) | {key for key in expected if key[0] == note_name}):
+            if python_rows.get(key) != expected.get(key):
+                mismatches.append((key[0], key[1], python_rows.get(key), expected.get(key)))
+    if mismatches:
+        logger.warning(f"{len(mismatches)} paragraphs differ between the Python parser and dbt.")
+    else:
+        logger.info(f"Python parser matches dbt on {len(notes)} notes.")
+    return mismatches
@@ -0,0 +1,120 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, q: float):
+    """
+    Nearest-rank percentile.
+    :param values: List of numbers
+    :param q: Percentile between 0 and 100
+    :return: The percentile, None for an empty list
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class MetricsRecorder:
+    def __init__(self):
+        """Thread-safe counters, gauges and latency samples of one pipeline stage."""
+        self.values = {}
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def incr(self, name: str, amount=1):
+        with self.lock:
+            self.values[name] = self.values.get(name, 0) + amount
+
+    def set(self, name: str, value):
+        with self.lock:
+            self.values[name] = value
+
+    def observe(self, name: str, value: float):
+        """Record one sample of a distribution, e.g. a latency."""
+        with self.lock:
+            self.samples.setdefault(name, []).append(value)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Add the wall time of the block to the {name}_seconds counter."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.incr(f"{name}_seconds", time.perf_counter() - start)
+
+    def rate(self, name: str, amount_name: str, seconds_name: str):
+        """Set name to amount_name / seconds_name when both are known."""
+        with self.lock:
+            amount = self.values.get(amount_name)
+            seconds = self.values.get(seconds_name)
+        if amount is not None and seconds:
+            self.set(name, amount / seconds)
+
+    def summary(self) -> dict:
+        """Flat dict of every value plus count/p50/p95/max of every distribution."""
+        with self.lock:
+            summary = dict(self.values)
+            samples = {name: list(values) for name, values in self.samples.items()}
+        for name, values in samples.items():
+            summary[f"{name}_count"] = len(values)
+            summary[f"{name}_p50"] = percentile(values, 50)
+            summary[f"{name}_p95"] = percentile(values, 95)
+            summary[f"{name}_max"] = max(values) if values else None
+        return summary
+
+
+def dbt_model_timings(run_results_path: str) -> dict:
+    """
+    Reads the model durations of a dbt run.
+    :param run_results_path: Path of the run_results.json written by dbt run
+    :return: Dict of model name -> execution time in seconds
+    """
+    try:
+        with open(run_results_path, "r", encoding="utf-8") as file:
+            run_results = json.load(file)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read dbt run results {run_results_path}: {e}")
+        return {}
+    return {
+        result["unique_id"].split(".")[-1]: result.get("execution_time")
+        for result in run_results.get("results", [])
+    }
+
+
+def _prometheus_name(name: str) -> str:
+    return "".join(char if char.isalnum() else "_" for char in f"wizetts_{name}").lower()
+
+
+def write_metrics(directory: str, run_id: str, stage: str, summary: dict):
+    """
+    Appends the summary of a stage to metrics.jsonl and rewrites its Prometheus textfile.
+    :param directory: Sink directory, also usable by the node_exporter textfile collector
+    :param run_id: Identifier of the pipeline run
+    :param stage: Name of the stage (the Dagster op)
+    :param summary: Numbers returned by MetricsRecorder.summary
+    """
+    os.makedirs(directory, exist_ok=True)
+    record = {"run_id": run_id, "stage": stage, "timestamp": time.time(), "metrics": summary}
+    with open(os.path.join(directory, "metrics.jsonl"), "a", encoding="utf-8") as file:
+        file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    lines = []
+    for name, value in sorted(summary.items()):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        lines.append(f'{_prometheus_name(name)}{{stage="{stage}"}} {value}')
+    prom_path = os.path.join(directory, f"wizetts_{stage}.prom")
+    with open(f"{prom_path}.tmp", "w", encoding="utf-8") as file:
+        file.write("\n".join(lines) + "\n")
+    os.replace(f"{prom_path}.tmp", prom_path)
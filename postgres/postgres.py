@@ -1,12 +1,92 @@
-import psycopg2
+import threading
+from contextlib import contextmanager
+
+# psycopg2 is imported where it is used, so that importing this module stays cheap
+
+# Connection pools shared by every client pointing at the same database
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
 
 class PostgresClient:
-    def __init__(self, host, port, database, user, password):
+    def __init__(self, host, port, database, user, password, min_connections=1, max_connections=5):
         self.DB_HOST = host
         self.DB_PORT = port
         self.DB_NAME = database
         self.DB_USER = user
         self.DB_PASSWORD = password
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self._local = threading.local()
+
+    def _get_pool(self):
+        """Return the process-wide pool for this database, creating it on first use."""
+        from psycopg2 import pool
+
+        key = (self.DB_HOST, self.DB_PORT, self.DB_NAME, self.DB_USER)
+        with _POOLS_LOCK:
+            connection_pool = _POOLS.get(key)
+            if connection_pool is None or connection_pool.closed:
+                connection_pool = pool.ThreadedConnectionPool(
+                    self.min_connections,
+                    self.max_connections,
+                    host=self.DB_HOST,
+                    port=self.DB_PORT,
+                    database=self.DB_NAME,
+                    user=self.DB_USER,
+                    password=self.DB_PASSWORD
+                )
+                _POOLS[key] = connection_pool
+            return connection_pool
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrows a connection from the pool. Uncommitted work is rolled back on return.
+        Inside transaction() the transaction's connection is reused.
+        """
+        from psycopg2 import extensions
+
+        active = getattr(self._local, "connection", None)
+        if active is not None:
+            yield active
+            return
+
+        connection_pool = self._get_pool()
+        conn = connection_pool.getconn()
+        try:
+            yield conn
+        finally:
+            if conn.closed:
+                connection_pool.putconn(conn, close=True)
+            else:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                connection_pool.putconn(conn)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs every statement issued by this client in the block within one transaction,
+        committed on success and rolled back on error.
+        """
+        if getattr(self._local, "connection", None) is not None:
+            yield self._local.connection
+            return
+
+        with self.connection() as conn:
+            self._local.connection = conn
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                self._local.connection = None
+
+    def _in_transaction(self):
+        return getattr(self._local, "connection", None) is not None
 
     def execute_query(self, query, params=None, fetch=True):
         """
@@ -17,22 +97,75 @@ class PostgresClient:
         :param fetch: Boolean indicating whether to fetch results. If False, only executes the query.
         :return: Query results if fetch=True, otherwise None.
         """
+        import psycopg2
+
+        in_transaction = self._in_transaction()
         try:
-            with psycopg2.connect(
-                host=self.DB_HOST,
-                port=self.DB_PORT,
-                database=self.DB_NAME,
-                user=self.DB_USER,
-                password=self.DB_PASSWORD
-            ) as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cursor:
                     cursor.execute(query, params)
-                    
-                    if fetch:
-                        return cursor.fetchall()
-                    else:
+
+                    result = cursor.fetchall() if fetch else None
+                    if not in_transaction:
                         conn.commit()
-                        return None
+                    return result
         except psycopg2.Error as e:
+            if in_transaction:
+                raise
             print(f"An error occurred: {e}")
             return None
+
+    def execute_many(self, query, rows, page_size=500):
+        """
+        Executes a statement for every row, sending them in pages of VALUES lists.
+
+        :param query: Statement containing a single VALUES %s placeholder.
+        :param rows: Sequence of tuples.
+        :param page_size: Number of rows sent per round-trip.
+        :return: Number of rows sent.
+        """
+        from psycopg2.extras import execute_values
+
+        rows = list(rows)
+        if not rows:
+            return 0
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                execute_values(cursor, query, rows, page_size=page_size)
+            if not self._in_transaction():
+                conn.commit()
+        return len(rows)
+
+    def bulk_upsert(self, table, columns, rows, conflict_columns, update_columns=None, page_size=500):
+        """
+        Inserts rows, updating the existing ones that collide on conflict_columns.
+
+        :param table: Qualified table name, e.g. wizetts.note_content.
+        :param columns: Column names matching the tuples in rows.
+        :param rows: Sequence of tuples.
+        :param conflict_columns: Columns of the unique constraint used for ON CONFLICT.
+        :param update_columns: Columns overwritten on conflict, defaults to every non-conflict column.
+        :param page_size: Number of rows sent per round-trip.
+        :return: Number of rows sent.
+        """
+        if update_columns is None:
+            update_columns = [column for column in columns if column not in conflict_columns]
+        if update_columns:
+            assignments = ", ".join(f"{column} = EXCLUDED.{column}" for column in update_columns)
+            on_conflict = f"DO UPDATE SET {assignments}"
+        else:
+            on_conflict = "DO NOTHING"
+        query = f"""
+        INSERT INTO {table} ({", ".join(columns)})
+        VALUES %s
+        ON CONFLICT ({", ".join(conflict_columns)}) {on_conflict};
+        """
+        return self.execute_many(query, rows, page_size=page_size)
+
+    @staticmethod
+    def close_all():
+        """Close every pooled connection of this process."""
+        with _POOLS_LOCK:
+            for connection_pool in _POOLS.values():
+                connection_pool.closeall()
+            _POOLS.clear()
@@ -0,0 +1,47 @@
+"""
+Extra TTS worker rendering the paragraphs queued in wizetts.tts_render_queue by the pipeline.
+
+    python render_worker.py                 # poll the queue until interrupted
+    python render_worker.py --once          # exit when nothing is left to claim
+
+Start as many as the TTS engine and its rate limit allow, on this machine or any machine sharing
+config/conf.yaml, the database and the generated_audio directory.
+"""
+import argparse
+import logging
+import time
+
+import dagster_main
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+    parser.add_argument('--poll-seconds', type=float, default=30.0, help='delay between two polls of an empty queue')
+    args = parser.parse_args()
+
+    config = dagster_main.load_config()
+    processor = dagster_main.build_tts_processor(config)
+    if processor.job_queue is None:
+        parser.error("tts.queue.enabled is false in config/conf.yaml, there is no queue to work on")
+
+    try:
+        while True:
+            rendered, failed = processor.drain_queue()
+            if rendered or failed:
+                logger.info(f"Rendered {rendered} queued paragraphs, {failed} failed.")
+                processor.finish_run(close_backend=False)
+            if args.once:
+                break
+            time.sleep(args.poll_seconds)
+    except KeyboardInterrupt:
+        logger.info("Worker stopped, its leased jobs are released when their lease expires.")
+    finally:
+        processor.backend.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Re-render only the paragraphs matching a full-text query, some notes or an order range.
+
+    python rerender.py --query "Mia"
+    python rerender.py --query "\"pluie d'étoiles\" -Gamé" --note "Partie 3%"
+    python rerender.py --note "Partie 1 - La traversée.md" --orders 10-20 --dry-run
+
+The query uses the web-search syntax of websearch_to_tsquery with the French configuration, so
+"Mia" also matches its inflections and accents must be typed as they are written in the notes.
+"""
+import argparse
+import logging
+
+import dagster_main
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def parse_orders(value: str):
+    """'10-20' -> (10, 20), '10-' -> (10, None), '-20' -> (None, 20), '7' -> (7, 7)."""
+    first, separator, last = value.partition('-')
+    if not separator:
+        last = first
+    try:
+        return (int(first) if first else None), (int(last) if last else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid order range: {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--query', help='full-text query, e.g. Mia or "Mia -Gamé"')
+    parser.add_argument('--note', action='append', dest='notes', help='note name or ILIKE pattern, repeatable')
+    parser.add_argument('--orders', type=parse_orders, default=(None, None), help='paragraph order range, e.g. 10-20')
+    parser.add_argument('--no-force', dest='force', action='store_false',
+                        help='serve the paragraphs from the audio cache when possible')
+    parser.add_argument('--native', action='store_true', help='select from wizetts.native_cleaned_paragraphes')
+    parser.add_argument('--dry-run', action='store_true', help='list the selected paragraphs without rendering')
+    args = parser.parse_args()
+    if not (args.query or args.notes or args.orders != (None, None)):
+        parser.error("select paragraphs with --query, --note or --orders")
+
+    config = dagster_main.load_config()
+    _, rows, failed = dagster_main.rerender_selection(
+        config, query=args.query, note_names=args.notes, first_order=args.orders[0], last_order=args.orders[1],
+        force=args.force, native=args.native, dry_run=args.dry_run
+    )
+    for note_name, order, content in rows:
+        print(f"{note_name} #{order}: {content[:80]}")
+    if not args.dry_run:
+        print(f"Re-rendered {len(rows) - len(failed)} of {len(rows)} paragraphs.")
+        for output_filename in failed:
+            print(f"FAILED: {output_filename}")
+
+
+if __name__ == '__main__':
+    main()
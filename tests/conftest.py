@@ -0,0 +1,74 @@
+import pytest
+
+from TTS_gtts import backends
+from TTS_gtts import text_to_speech
+
+# MPEG-1 Layer III, 64 kbit/s, 44.1 kHz: one 208-byte frame lasts 26ms
+FRAME = bytes([0xFF, 0xFB, 0x50, 0x00]) + bytes(204)
+NOTE_NAME = 'note.md'
+
+
+class RecordingBackend(backends.TTSBackend):
+    name = 'recording'
+
+    def __init__(self):
+        """
+        Writes valid MP3 frames behind an ID3 tag holding the text, so that tests can tell the files apart.
+        crash_on names a text whose synthesis raises KeyboardInterrupt, which nothing catches, like a process dying.
+        """
+        self.calls = []
+        self.crash_on = None
+
+    def synthesize(self, text: str, file_path: str):
+        if text == self.crash_on:
+            raise KeyboardInterrupt(text)
+        self.calls.append(text)
+        tag = text.encode('utf-8')
+        size = bytes([(len(tag) >> shift) & 0x7F for shift in (21, 14, 7, 0)])
+        with open(file_path, 'wb') as file:
+            file.write(b'ID3\x04\x00\x00' + size + tag + FRAME * 40)
+
+
+def read_tag(path) -> str:
+    """The text recorded in a file written by RecordingBackend."""
+    with open(path, 'rb') as file:
+        header = file.read(10)
+        size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        return file.read(size).decode('utf-8')
+
+
+@pytest.fixture
+def backend():
+    return RecordingBackend()
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    return tmp_path / 'generated_audio'
+
+
+@pytest.fixture
+def make_processor(backend, output_dir):
+    """Builds TTSProcessors sharing the backend and output directory, like successive runs."""
+    def make(**options):
+        db_params = {'host': 'localhost', 'port': 5432, 'database': 'test', 'user': 'test', 'password': ''}
+        return text_to_speech.TTSProcessor(db_params=db_params, output_dir=str(output_dir), backend=backend,
+                                           **options)
+    return make
+
+
+@pytest.fixture
+def render_note():
+    """Renders the given paragraph texts as the whole content of one note."""
+    def render(processor, *texts):
+        rows = [(NOTE_NAME, order, text) for order, text in enumerate(texts, start=1)]
+        return processor.render_paragraph_batches([rows])
+    return render
+
+
+@pytest.fixture
+def rendered_texts(output_dir):
+    """Texts held by the audio files of the note, in paragraph order."""
+    def read(count):
+        return [read_tag(output_dir / f"{NOTE_NAME}_{order}.mp3") for order in range(1, count + 1)]
+    return read
@@ -0,0 +1,94 @@
+import os
+import time
+
+from TTS_gtts import audio_cache
+
+
+def write_audio(path, size=100, fill=b'a'):
+    with open(path, 'wb') as file:
+        file.write(fill * size)
+    return str(path)
+
+
+def cache_files(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name != audio_cache.AudioCache.MANIFEST_NAME)
+
+
+def test_key_is_stable_and_covers_every_setting():
+    key = audio_cache.AudioCache.make_key('Bonjour', 'fr', 'gtts', {'speed': 1.0, 'voice': 'a'})
+
+    assert key == audio_cache.AudioCache.make_key('Bonjour', 'fr', 'gtts', {'voice': 'a', 'speed': 1.0})
+    assert audio_cache.AudioCache.make_key('Bonjour', 'fr', 'gtts') == \
+        audio_cache.AudioCache.make_key('Bonjour', 'fr', 'gtts', {})
+    assert len({
+        key,
+        audio_cache.AudioCache.make_key('Bonsoir', 'fr', 'gtts', {'speed': 1.0, 'voice': 'a'}),
+        audio_cache.AudioCache.make_key('Bonjour', 'en', 'gtts', {'speed': 1.0, 'voice': 'a'}),
+        audio_cache.AudioCache.make_key('Bonjour', 'fr', 'coqui', {'speed': 1.0, 'voice': 'a'}),
+        audio_cache.AudioCache.make_key('Bonjour', 'fr', 'gtts', {'speed': 1.5, 'voice': 'a'}),
+    }) == 5
+
+
+def test_materialize_serves_cached_audio(tmp_path):
+    cache = audio_cache.AudioCache(str(tmp_path / 'cache'))
+    cache.put('k', write_audio(tmp_path / 'source.mp3'))
+
+    assert cache.materialize('k', str(tmp_path / 'copy.mp3'))
+    assert (tmp_path / 'copy.mp3').read_bytes() == (tmp_path / 'source.mp3').read_bytes()
+    assert not cache.materialize('missing', str(tmp_path / 'other.mp3'))
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_garbage_collect_evicts_old_entries(tmp_path):
+    cache = audio_cache.AudioCache(str(tmp_path / 'cache'), max_age_days=1)
+    cache.put('old', write_audio(tmp_path / 'old.mp3'))
+    cache.put('new', write_audio(tmp_path / 'new.mp3'))
+    cache.entries['old']['last_access'] = time.time() - 2 * 86400
+
+    assert cache.garbage_collect() == 1
+    assert set(cache.entries) == {'new'}
+    assert cache_files(tmp_path / 'cache') == ['new.mp3']
+
+
+def test_garbage_collect_evicts_least_recently_used_above_max_size(tmp_path):
+    cache = audio_cache.AudioCache(str(tmp_path / 'cache'), max_size_bytes=250)
+    for key, last_access in [('a', 30), ('b', 10), ('c', 20)]:
+        cache.put(key, write_audio(tmp_path / f'{key}.mp3'))
+        cache.entries[key]['last_access'] = last_access
+
+    assert cache.garbage_collect() == 1
+    assert set(cache.entries) == {'a', 'c'}
+    assert cache_files(tmp_path / 'cache') == ['a.mp3', 'c.mp3']
+
+
+def test_garbage_collect_keeps_recent_orphans(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    cache = audio_cache.AudioCache(str(cache_dir))
+    # Written by processes that have not saved their manifest, one of them long gone
+    write_audio(cache_dir / 'recent.mp3')
+    old = write_audio(cache_dir / 'old.mp3')
+    stale = time.time() - audio_cache.AudioCache.ORPHAN_GRACE_SECONDS - 60
+    os.utime(old, (stale, stale))
+
+    assert cache.garbage_collect() == 0
+    assert cache_files(cache_dir) == ['recent.mp3']
+
+
+def test_save_merges_the_manifests_of_other_processes(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    first = audio_cache.AudioCache(cache_dir)
+    second = audio_cache.AudioCache(cache_dir)
+    first.put('shared', write_audio(tmp_path / 'shared.mp3'))
+    first.put('first', write_audio(tmp_path / 'first.mp3'))
+    second.put('shared', write_audio(tmp_path / 'shared.mp3'))
+    second.put('second', write_audio(tmp_path / 'second.mp3'))
+    first.entries['shared']['last_access'] = 100
+    second.entries['shared']['last_access'] = 200
+
+    second.save()
+    first.save()
+
+    entries = audio_cache.AudioCache(cache_dir).entries
+    assert set(entries) == {'shared', 'first', 'second'}
+    # The most recent access wins
+    assert entries['shared']['last_access'] == 200
@@ -0,0 +1,98 @@
+import wave
+
+import pytest
+
+from TTS_gtts import audio_files
+
+# MPEG-1 Layer III, 64 kbit/s, 44.1 kHz, no padding: 208-byte frames of 1152 samples
+FRAME_HEADER = bytes([0xFF, 0xFB, 0x50, 0x00])
+FRAME_LENGTH = 208
+FRAME_SECONDS = 1152 / 44100
+
+
+def write_mp3(path, frames, id3=False, cut=0):
+    data = (FRAME_HEADER + bytes(FRAME_LENGTH - 4)) * frames
+    if id3:
+        data = b'ID3' + bytes([4, 0, 0, 0, 0, 0, 16]) + bytes(16) + data
+    with open(path, 'wb') as file:
+        file.write(data[:len(data) - cut])
+    return str(path)
+
+
+def write_wav(path, seconds, rate=8000):
+    with wave.open(str(path), 'wb') as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(rate)
+        file.writeframes(bytes(2 * int(seconds * rate)))
+    return str(path)
+
+
+def test_mp3_frames_skip_the_id3_tag(tmp_path):
+    path = write_mp3(tmp_path / 'a.mp3', 10, id3=True)
+
+    frames, duration, truncated = audio_files.mp3_frames(path)
+    assert frames == 10
+    assert duration == pytest.approx(10 * FRAME_SECONDS)
+    assert not truncated
+    assert audio_files.mp3_frame_range(path) == (26, 26 + 10 * FRAME_LENGTH)
+
+
+def test_check_audio_rejects_truncated_mp3(tmp_path):
+    path = write_mp3(tmp_path / 'a.mp3', 10, cut=50)
+
+    assert audio_files.mp3_frames(path)[2]
+    with pytest.raises(ValueError, match='Truncated'):
+        audio_files.check_audio(path)
+
+
+def test_check_audio_rejects_audio_too_short_for_its_text(tmp_path):
+    path = write_mp3(tmp_path / 'a.mp3', 10)  # About a quarter of a second
+
+    audio_files.check_audio(path, 'Court.')
+    with pytest.raises(ValueError, match='too short'):
+        audio_files.check_audio(path, 'Une phrase bien trop longue pour un quart de seconde de son.')
+
+
+def test_check_audio_rejects_empty_and_truncated_wav(tmp_path):
+    empty = tmp_path / 'empty.wav'
+    empty.write_bytes(b'')
+    with pytest.raises(ValueError, match='Empty'):
+        audio_files.check_audio(str(empty))
+
+    path = write_wav(tmp_path / 'a.wav', 1.0)
+    audio_files.check_audio(path, 'Bonjour.')
+    with open(path, 'r+b') as file:
+        file.truncate(1000)
+    with pytest.raises(ValueError, match='Truncated'):
+        audio_files.check_audio(path)
+
+
+def test_concat_audio_keeps_every_frame(tmp_path):
+    parts = [write_mp3(tmp_path / 'a.mp3', 3, id3=True), write_mp3(tmp_path / 'b.mp3', 4)]
+    dest = str(tmp_path / 'ab.mp3')
+    audio_files.concat_audio(parts, dest)
+    assert audio_files.mp3_frames(dest)[:1] == (7,)
+
+    wav_parts = [write_wav(tmp_path / 'a.wav', 0.5), write_wav(tmp_path / 'b.wav', 0.25)]
+    wav_dest = str(tmp_path / 'ab.wav')
+    audio_files.concat_audio(wav_parts, wav_dest)
+    assert audio_files.wav_duration(wav_dest) == pytest.approx(0.75)
+
+
+def test_atomic_output_leaves_nothing_on_failure(tmp_path):
+    dest = tmp_path / 'a.mp3'
+    dest.write_bytes(b'old')
+
+    with pytest.raises(RuntimeError):
+        with audio_files.atomic_output(str(dest)) as tmp:
+            with open(tmp, 'wb') as file:
+                file.write(b'half')
+            raise RuntimeError('synthesis failed')
+    assert dest.read_bytes() == b'old'
+    assert [path.name for path in tmp_path.iterdir()] == ['a.mp3']
+
+    with audio_files.atomic_output(str(dest)) as tmp:
+        with open(tmp, 'wb') as file:
+            file.write(b'new')
+    assert dest.read_bytes() == b'new'
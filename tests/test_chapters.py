@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from TTS_gtts import chapters
+
+from test_audio_files import FRAME_LENGTH, FRAME_SECONDS, write_mp3, write_wav
+
+
+def test_build_index_mp3_offsets(tmp_path):
+    paragraphs = [(1, write_mp3(tmp_path / 'note.md_1.mp3', 10, id3=True)),
+                  (3, write_mp3(tmp_path / 'note.md_3.mp3', 5))]
+
+    index = chapters.build_index('note.md', paragraphs)
+
+    first, second = index['paragraphs']
+    assert (first['order'], first['source']) == (1, 'note.md_1.mp3')
+    assert (first['byte_offset'], first['byte_length']) == (0, 10 * FRAME_LENGTH)
+    assert (second['byte_offset'], second['byte_length']) == (10 * FRAME_LENGTH, 5 * FRAME_LENGTH)
+    assert first['start_seconds'] == 0
+    assert second['start_seconds'] == pytest.approx(10 * FRAME_SECONDS, abs=0.001)
+    assert second['duration_seconds'] == pytest.approx(5 * FRAME_SECONDS, abs=0.001)
+    assert index['duration_seconds'] == pytest.approx(15 * FRAME_SECONDS, abs=0.001)
+
+
+def test_build_index_wav_has_no_byte_ranges(tmp_path):
+    paragraphs = [(1, write_wav(tmp_path / 'note.md_1.wav', 1.5)), (2, write_wav(tmp_path / 'note.md_2.wav', 0.5))]
+
+    index = chapters.build_index('note.md', paragraphs)
+
+    assert [(entry['start_seconds'], entry['duration_seconds']) for entry in index['paragraphs']] == \
+        [(0, 1.5), (1.5, 0.5)]
+    assert 'byte_offset' not in index['paragraphs'][0]
+    assert index['duration_seconds'] == 2.0
+
+
+def test_assembled_chapter_byte_ranges_point_at_each_paragraph(tmp_path):
+    paragraphs = [(1, write_mp3(tmp_path / 'note.md_1.mp3', 10, id3=True)),
+                  (2, write_mp3(tmp_path / 'note.md_2.mp3', 5))]
+    chapters_dir = tmp_path / 'chapters'
+
+    assert chapters.assemble_chapter('Partie 1.md', paragraphs, str(chapters_dir), version='v1')
+
+    index = json.loads((chapters_dir / 'Partie 1.json').read_text(encoding='utf-8'))
+    chapter = (chapters_dir / 'Partie 1.mp3').read_bytes()
+    assert index['file'] == 'Partie 1.mp3'
+    assert index['version'] == 'v1'
+    for entry, (_, path) in zip(index['paragraphs'], paragraphs):
+        with open(path, 'rb') as file:
+            frames = file.read()[-entry['byte_length']:]
+        assert chapter[entry['byte_offset']:entry['byte_offset'] + entry['byte_length']] == frames
+
+
+def test_assemble_chapter_skips_an_unchanged_version(tmp_path):
+    paragraphs = [(1, write_mp3(tmp_path / 'note.md_1.mp3', 10))]
+    chapters_dir = str(tmp_path / 'chapters')
+    chapter = tmp_path / 'chapters' / 'note.mp3'
+
+    assert chapters.assemble_chapter('note.md', paragraphs, chapters_dir, version='v1')
+    chapter.write_bytes(b'untouched')
+
+    assert not chapters.assemble_chapter('note.md', paragraphs, chapters_dir, version='v1')
+    assert chapter.read_bytes() == b'untouched'
+
+    assert chapters.assemble_chapter('note.md', paragraphs, chapters_dir, version='v1', force=True)
+    assert chapter.stat().st_size == 10 * FRAME_LENGTH
+    chapter.write_bytes(b'untouched')
+    assert chapters.assemble_chapter('note.md', paragraphs, chapters_dir, version='v2')
+    assert chapter.stat().st_size == 10 * FRAME_LENGTH
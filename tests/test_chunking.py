@@ -0,0 +1,30 @@
+from TTS_gtts import chunking
+
+
+def test_short_paragraph_is_one_chunk():
+    assert chunking.split_into_chunks('Bonjour. Au revoir.', 100) == ['Bonjour. Au revoir.']
+
+
+def test_blank_paragraph_has_no_chunk():
+    assert chunking.split_into_chunks('   ', 100) == []
+
+
+def test_split_sentences_keeps_punctuation_and_quotes():
+    assert chunking.split_sentences('« Où es-tu ? » Mia se tut… Puis elle partit.') == \
+        ['« Où es-tu ? »', 'Mia se tut…', 'Puis elle partit.']
+
+
+def test_chunks_stop_at_sentence_boundaries():
+    text = 'Première phrase assez longue. Deuxième phrase assez longue. Troisième.'
+    chunks = chunking.split_into_chunks(text, 35)
+
+    assert chunks == ['Première phrase assez longue.', 'Deuxième phrase assez longue.', 'Troisième.']
+
+
+def test_overlong_sentence_is_split_at_clauses_then_spaces():
+    text = 'un deux trois quatre, cinq six sept huit neuf dix onze douze treize quatorze'
+    chunks = chunking.split_into_chunks(text, 25)
+
+    assert all(len(chunk) <= 25 for chunk in chunks)
+    assert ' '.join(chunks) == text
+    assert chunks[0] == 'un deux trois quatre,'
@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from TTS_gtts import concurrency
+
+
+class FakeClock:
+    """Stands in for time.monotonic and time.sleep, sleeping only moves the clock forward."""
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(concurrency.time, 'monotonic', fake.monotonic)
+    monkeypatch.setattr(concurrency.time, 'sleep', fake.sleep)
+    return fake
+
+
+def test_token_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        concurrency.TokenBucket(0)
+
+
+def test_token_bucket_allows_a_burst_then_limits_the_rate(clock):
+    bucket = concurrency.TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.now == 0
+
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_retries_with_exponential_backoff(clock):
+    calls = []
+
+    def flaky(item):
+        calls.append(item)
+        if len(calls) < 3:
+            raise RuntimeError('engine down')
+        return item.upper()
+
+    results = list(concurrency.map_concurrently(flaky, ['a'], max_retries=2, backoff_seconds=0.5))
+
+    assert results == [concurrency.TaskResult(0, 'a', True, 'A', None, 3)]
+    assert clock.sleeps == [0.5, 1.0]
+
+
+def test_gives_up_after_max_retries(clock):
+    def broken(item):
+        raise RuntimeError(item)
+
+    result, = concurrency.map_concurrently(broken, ['a'], max_retries=1, backoff_seconds=0.5)
+
+    assert not result.ok
+    assert str(result.error) == 'a'
+    assert result.attempts == 2
+    assert clock.sleeps == [0.5]
+
+
+def test_results_are_yielded_in_input_order():
+    # Each item waits for the next one to start, so they finish in reverse order
+    started = [threading.Event() for _ in range(5)]
+
+    def work(index):
+        started[index].set()
+        if index + 1 < len(started):
+            started[index + 1].wait(timeout=5)
+            time.sleep(0.01 * (len(started) - index))
+        return index * 10
+
+    results = list(concurrency.map_concurrently(work, range(5), max_workers=5))
+
+    assert [result.index for result in results] == [0, 1, 2, 3, 4]
+    assert [result.value for result in results] == [0, 10, 20, 30, 40]
+    assert all(result.ok and result.attempts == 1 for result in results)
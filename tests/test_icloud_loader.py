@@ -0,0 +1,109 @@
+import io
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from icloud import icloud_loader
+
+
+class FakeNode:
+    def __init__(self, name, children=()):
+        """A drive folder, counting the lookups of its children."""
+        self.name = name
+        self.children = {child.name: child for child in children}
+        self.lookups = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            self.lookups[name] = self.lookups.get(name, 0) + 1
+        time.sleep(0.01)  # Widen the window of concurrent lookups
+        return self.children[name]
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.raw = io.BytesIO(content)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class FakeFile:
+    def __init__(self, name, content, etag, delay=0.0):
+        """A drive file, slow downloads finish after the ones started later."""
+        self.name = name
+        self.content = content
+        self.date_modified = '2025-01-01T00:00:00'
+        self.size = len(content)
+        self.type = 'file'
+        self.data = {'etag': etag}
+        self.delay = delay
+
+    def open(self, stream=False):
+        time.sleep(self.delay)
+        return FakeResponse(self.content)
+
+
+@pytest.fixture
+def drive():
+    arc = FakeNode('05 - Arc 1', [
+        FakeNode('PART 01', [FakeFile('Partie 1.md', content=b'# Partie 1', etag='e1', delay=0.05)]),
+        FakeNode('PART 02', [FakeFile('Partie 2.md', content=b'# Partie 2', etag='e2')]),
+    ])
+    phase = FakeNode('01 - Phase 1', [FakeFile('Phase 1.md', content=b'# Phase 1', etag='e3', delay=0.02)])
+    return FakeNode('root', [FakeNode('Obsidian', [FakeNode('04 - Arcs', [arc, phase])])])
+
+
+@pytest.fixture
+def connection(drive, monkeypatch, tmp_path):
+    class FakeService:
+        def __init__(self, username, password):
+            self.requires_2fa = False
+            self.requires_2sa = False
+            self.drive = drive
+
+    monkeypatch.setitem(sys.modules, 'pyicloud', types.SimpleNamespace(PyiCloudService=FakeService))
+    monkeypatch.chdir(tmp_path)
+    return icloud_loader.ICloudConnection(username='user', password='secret')
+
+
+PATHS = [
+    ['Obsidian', '04 - Arcs', '05 - Arc 1', 'PART 01', 'Partie 1.md'],
+    ['Obsidian', '04 - Arcs', '05 - Arc 1', 'PART 02', 'Partie 2.md'],
+    ['Obsidian', '04 - Arcs', '01 - Phase 1', 'Phase 1.md'],
+]
+
+
+def test_load_many_resolves_shared_folders_once(connection, drive):
+    connection.load_many(PATHS, max_workers=3)
+
+    obsidian = drive.children['Obsidian']
+    arcs = obsidian.children['04 - Arcs']
+    assert drive.lookups == {'Obsidian': 1}
+    assert obsidian.lookups == {'04 - Arcs': 1}
+    assert arcs.lookups == {'05 - Arc 1': 1, '01 - Phase 1': 1}
+    assert arcs.children['05 - Arc 1'].lookups == {'PART 01': 1, 'PART 02': 1}
+
+
+def test_load_many_returns_results_in_input_order(connection):
+    notes = connection.load_many(PATHS, max_workers=3)
+
+    assert [note['note_name'] for note in notes] == ['Partie 1.md', 'Partie 2.md', 'Phase 1.md']
+    with open(notes[0]['local_path'], 'rb') as file:
+        assert file.read() == b'# Partie 1'
+
+
+def test_load_many_skips_unchanged_files_and_reports_missing_ones(connection):
+    paths = PATHS + [['Obsidian', '04 - Arcs', 'Absent.md']]
+    notes = connection.load_many(paths, known_states={'Partie 2.md': {'etag': 'e2'}}, max_workers=2)
+
+    assert notes[0]['local_path'] is not None
+    assert notes[1]['local_path'] is None
+    assert notes[3] is None
@@ -0,0 +1,59 @@
+import pytest
+
+from TTS_gtts import normalization
+
+
+def test_words_inside_markdown_are_replaced():
+    normalizer = normalization.TextNormalizer(words={'Yamés': 'Yamèsse'})
+
+    assert normalizer.normalize('Puis [[Yamés]] arrive.') == 'Puis Yamèsse arrive.'
+    assert normalizer.normalize('Puis [[Phase 2|Yamés]] arrive.') == 'Puis Yamèsse arrive.'
+    assert normalizer.normalize('**Yamés** et [Yamés](x.md).') == 'Yamèsse et Yamèsse.'
+
+
+def test_nested_markdown_is_stripped():
+    normalizer = normalization.TextNormalizer()
+
+    assert normalizer.normalize('Voir [**lien**](x) et ![image](y.png)ici.') == 'Voir lien et ici.'
+    assert normalizer.normalize('## Titre `code` <br>') == 'Titre code'
+
+
+def test_words_match_whole_words_longest_first():
+    normalizer = normalization.TextNormalizer(words={'Gamé': 'Gamai', 'Gamélia': 'Gamélia la'})
+
+    assert normalizer.normalize('Gamé et Gamélia, pas Gamés.') == 'Gamai et Gamélia la, pas Gamés.'
+
+
+def test_ignore_case_words():
+    normalizer = normalization.TextNormalizer(words={'WizeCosm': 'Ouaïze Cosme'}, ignore_case_words=True)
+
+    assert normalizer.normalize('wizecosm') == 'Ouaïze Cosme'
+
+
+def test_rules_win_over_words_and_keep_their_groups():
+    normalizer = normalization.TextNormalizer(
+        rules=[(r'(\d+) ?km\b', r'\1 kilomètres'), (r'(a)\1', 'double')], words={'km': 'kilo'}
+    )
+
+    assert normalizer.normalize('Encore 12 km, puis km et aa.') == 'Encore 12 kilomètres, puis kilo et double.'
+
+
+def test_without_markdown_stripping():
+    normalizer = normalization.TextNormalizer(strip_markdown=False)
+
+    assert normalizer.normalize('**gras**') == '**gras**'
+
+
+def test_invalid_pattern():
+    with pytest.raises(ValueError, match='Invalid lexicon pattern'):
+        normalization.TextNormalizer(rules=[('(', '')])
+
+
+def test_from_file(tmp_path):
+    path = tmp_path / 'lexicon.yaml'
+    path.write_text("words:\n  Yamés: Yamèsse\nrules:\n  - pattern: 'Mme'\n    replacement: Madame\n",
+                    encoding='utf-8')
+    normalizer = normalization.TextNormalizer.from_file(str(path))
+
+    assert normalizer.normalize('Mme [[Yamés]]') == 'Madame Yamèsse'
+    assert normalization.TextNormalizer.from_file(normalization.DEFAULT_LEXICON_PATH).normalize('*a*') == 'a'
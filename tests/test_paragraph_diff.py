@@ -0,0 +1,73 @@
+from TTS_gtts import paragraph_diff
+
+
+def hashes(*texts):
+    return [paragraph_diff.paragraph_hash(text) for text in texts]
+
+
+def test_identical_notes_are_unchanged():
+    diff = paragraph_diff.diff_paragraphs(hashes('a', 'b'), hashes('a', 'b'))
+
+    assert diff.unchanged == [1, 2]
+    assert diff.to_render() == []
+
+
+def test_insertion_moves_the_following_paragraphs():
+    diff = paragraph_diff.diff_paragraphs(hashes('a', 'b', 'c'), hashes('n', 'a', 'b', 'c'))
+
+    assert diff.added == [1]
+    assert sorted(diff.moved) == [(1, 2), (2, 3), (3, 4)]
+    assert diff.to_render() == [1]
+
+
+def test_edit_in_place_is_a_change():
+    diff = paragraph_diff.diff_paragraphs(hashes('a', 'b', 'c'), hashes('a', 'B', 'c'))
+
+    assert diff.changed == [2]
+    assert diff.unchanged == [1, 3]
+
+
+def test_cut_and_paste_is_a_move():
+    diff = paragraph_diff.diff_paragraphs(hashes('a', 'b', 'c'), hashes('b', 'c', 'a'))
+
+    assert (1, 3) in diff.moved
+    assert diff.to_render() == []
+    assert diff.deleted == []
+
+
+def test_deleted_paragraphs():
+    diff = paragraph_diff.diff_paragraphs(hashes('a', 'b', 'c'), hashes('a', 'c'))
+
+    assert diff.deleted == [2]
+    assert diff.moved == [(3, 2)]
+
+
+def test_unrendered_paragraphs_are_rendered_again():
+    previous = hashes('a', 'b')
+    previous[1] = None
+    diff = paragraph_diff.diff_paragraphs(previous, hashes('a', 'b'))
+
+    assert diff.to_render() == [2]
+
+
+def test_render_state_round_trip(tmp_path):
+    path = str(tmp_path / 'state.json')
+    state = paragraph_diff.RenderState(path)
+    state.set('note.md', ['h1', None])
+    state.save()
+
+    assert paragraph_diff.RenderState(path).get('note.md') == ['h1', None]
+    assert paragraph_diff.RenderState(path).get('other.md') is None
+
+
+def test_render_state_save_keeps_the_notes_of_other_processes(tmp_path):
+    path = str(tmp_path / 'state.json')
+    first = paragraph_diff.RenderState(path)
+    second = paragraph_diff.RenderState(path)
+    first.set('a.md', ['h1'])
+    second.set('b.md', ['h2'])
+    first.save()
+    second.save()
+
+    assert paragraph_diff.RenderState(path).notes == {'a.md': ['h1'], 'b.md': ['h2']}
+    assert second.get('a.md') == ['h1']
@@ -0,0 +1,94 @@
+"""
+The parity test runs against a real PostgreSQL, skipped unless WIZETTS_TEST_POSTGRES holds the connection string
+of a scratch database, see test_render_queue.py.
+"""
+import os
+
+import pytest
+
+from markdown_parsing import paragraphs
+from postgres import postgres
+
+DSN = os.environ.get('WIZETTS_TEST_POSTGRES')
+
+# Same split as paragraphes.sql and same cleaning as cleaned_paragraphes.sql
+DBT_QUERY = """
+SELECT
+    ROW_NUMBER() OVER (ORDER BY position) AS paragrapge_order,
+    REPLACE(
+        REGEXP_REPLACE(
+            REPLACE(
+                REPLACE(
+                    TRANSLATE(paragraph, '“”', '""'),
+                    '\"\"\"', '«'
+                ),
+                '* * *', ''
+            ),
+            '\\s+', ' ', 'g'
+        ),
+        '_', ''
+    ) AS content
+FROM REGEXP_SPLIT_TO_TABLE(%s, E'\\n\\n') WITH ORDINALITY AS t(paragraph, position)
+ORDER BY position;
+"""
+
+NOTES = [
+    '“Bonjour”, dit-elle.',
+    '"""Chapitre un"""',
+    'Avant\n\n* * *\n\nAprès',
+    'Deux\tmots  et\n  une ligne',
+    'Prix\xa0: 10 €',
+    '_Mia_ et __Gamé__',
+    'Un\n\n\nDeux',
+    '',
+]
+
+
+def test_split_paragraphs_keeps_empty_paragraphs():
+    assert paragraphs.split_paragraphs('Un\n\nDeux\n\n\n\nTrois') == ['Un', 'Deux', '', 'Trois']
+    # Three newlines split once, the third one stays at the start of the next paragraph
+    assert paragraphs.split_paragraphs('Un\n\n\nDeux') == ['Un', '\nDeux']
+    assert paragraphs.split_paragraphs('') == ['']
+
+
+def test_clean_paragraph_quotes():
+    assert paragraphs.clean_paragraph('“Bonjour”, dit-elle.') == '"Bonjour", dit-elle.'
+    assert paragraphs.clean_paragraph('"""Chapitre un"""') == '«Chapitre un«'
+    assert paragraphs.clean_paragraph('“""Chapitre un""”') == '«Chapitre un«'
+
+
+def test_clean_paragraph_separators_and_underscores():
+    assert paragraphs.clean_paragraph('* * *') == ''
+    assert paragraphs.clean_paragraph('Avant * * * après') == 'Avant après'
+    assert paragraphs.clean_paragraph('_Mia_ et __Gamé__') == 'Mia et Gamé'
+
+
+def test_clean_paragraph_whitespace():
+    assert paragraphs.clean_paragraph('Deux\tmots  et\n  une ligne') == 'Deux mots et une ligne'
+    assert paragraphs.clean_paragraph('\nDeux') == ' Deux'
+    # No-break spaces are not whitespace for Postgres, they are kept as they are
+    assert paragraphs.clean_paragraph('Prix\xa0: 10 €') == 'Prix\xa0: 10 €'
+    assert paragraphs.clean_paragraph('Prix \xa0 : 10') == 'Prix \xa0 : 10'
+
+
+def test_parse_note_numbers_paragraphs_from_one():
+    assert list(paragraphs.parse_note('note.md', 'Un\n\n* * *\n\nDeux')) == [
+        ('note.md', 1, 'Un'), ('note.md', 2, ''), ('note.md', 3, 'Deux')
+    ]
+
+
+@pytest.mark.skipif(not DSN, reason='WIZETTS_TEST_POSTGRES is not set')
+@pytest.mark.parametrize('content', NOTES + ['\n\n'.join(NOTES)])
+def test_parse_note_matches_dbt_models(content):
+    from psycopg2 import extensions
+
+    params = extensions.parse_dsn(DSN)
+    client = postgres.PostgresClient(host=params.get('host'), port=params.get('port', 5432),
+                                     database=params.get('dbname'), user=params.get('user'),
+                                     password=params.get('password'))
+    try:
+        dbt_rows = client.execute_query(DBT_QUERY, params=(content,))
+    finally:
+        postgres.PostgresClient.close_all()
+
+    assert [(order, text) for _, order, text in paragraphs.parse_note('note.md', content)] == dbt_rows
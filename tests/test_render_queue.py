@@ -0,0 +1,123 @@
+"""
+Runs against a real PostgreSQL, skipped unless WIZETTS_TEST_POSTGRES holds the connection string of a
+scratch database, e.g. WIZETTS_TEST_POSTGRES="host=localhost dbname=wizetts_test user=postgres".
+The wizetts.tts_render_queue table of that database is dropped.
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from postgres import postgres
+from TTS_gtts import render_queue
+
+DSN = os.environ.get('WIZETTS_TEST_POSTGRES')
+pytestmark = pytest.mark.skipif(not DSN, reason='WIZETTS_TEST_POSTGRES is not set')
+
+
+@pytest.fixture
+def postgres_client():
+    from psycopg2 import extensions
+
+    params = extensions.parse_dsn(DSN)
+    client = postgres.PostgresClient(host=params.get('host'), port=params.get('port', 5432),
+                                     database=params.get('dbname'), user=params.get('user'),
+                                     password=params.get('password'))
+    drop = f"CREATE SCHEMA IF NOT EXISTS wizetts; DROP TABLE IF EXISTS {render_queue.QUEUE_TABLE};"
+    client.execute_query(drop, fetch=False)
+    yield client
+    client.execute_query(drop, fetch=False)
+    postgres.PostgresClient.close_all()
+
+
+@pytest.fixture
+def queue(postgres_client):
+    return render_queue.RenderQueue(postgres_client, lease_seconds=900, retry_backoff_seconds=0)
+
+
+def dead_worker_id():
+    """Worker id of a process of this host that has exited."""
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return f"{socket.gethostname()}:{process.pid}"
+
+
+def job(order, text):
+    return ('note.md', order, text, f"hash-{text}", f"note.md_{order}.mp3")
+
+
+def test_claim_complete_and_fail(queue):
+    assert queue.enqueue([job(1, 'A'), job(2, 'B'), job(3, 'C')]) == 3
+
+    rows = queue.claim('host:1', 2)
+    assert rows == [('note.md', 1, 'A', 'note.md_1.mp3'), ('note.md', 2, 'B', 'note.md_2.mp3')]
+    assert queue.claim('host:2', 5) == [('note.md', 3, 'C', 'note.md_3.mp3')]
+    assert queue.count_in_progress() == 3
+
+    queue.complete('host:1', ['note.md_1.mp3'])
+    queue.fail('host:1', ['note.md_2.mp3'], 'engine down')
+    queue.complete('host:1', ['note.md_3.mp3'])  # Leased by host:2, left alone
+    statuses = queue.statuses(['note.md_1.mp3', 'note.md_2.mp3', 'note.md_3.mp3'])
+    assert statuses == {'note.md_1.mp3': (render_queue.DONE, 'hash-A'),
+                        'note.md_2.mp3': (render_queue.PENDING, 'hash-B'),
+                        'note.md_3.mp3': (render_queue.IN_PROGRESS, 'hash-C')}
+    assert queue.claim('host:1', 5, note_names=['note.md']) == [('note.md', 2, 'B', 'note.md_2.mp3')]
+
+
+def test_enqueue_keeps_done_jobs_of_the_same_text(queue):
+    queue.enqueue([job(1, 'A')])
+    queue.claim('host:1', 1)
+    queue.complete('host:1', ['note.md_1.mp3'])
+
+    queue.enqueue([job(1, 'A')])
+    assert queue.claim('host:1', 1) == []
+    queue.enqueue([job(1, 'A')], reset_done=True)
+    assert len(queue.claim('host:1', 1)) == 1
+
+
+def test_forget(queue):
+    queue.enqueue([job(1, 'A'), job(2, 'B')])
+    queue.forget(['note.md_1.mp3'])
+
+    assert list(queue.statuses(['note.md_1.mp3', 'note.md_2.mp3'])) == ['note.md_2.mp3']
+
+
+def test_release_dead_leases_of_this_host(queue):
+    dead = dead_worker_id()
+    alive = f"{socket.gethostname()}:{os.getppid()}"
+    queue.enqueue([job(1, 'A'), job(2, 'B'), job(3, 'C')])
+    queue.claim(dead, 1)
+    queue.claim(alive, 1)
+    queue.claim('other-host:1', 1)
+
+    assert queue.release_dead_leases(render_queue.default_worker_id()) == 1
+    assert queue.claim('host:9', 5) == [('note.md', 1, 'A', 'note.md_1.mp3')]
+    assert queue.count_in_progress() == 3
+
+
+def test_processor_resumes_the_jobs_of_a_crashed_run_at_once(queue, make_processor, backend, render_note,
+                                                              rendered_texts):
+    backend.crash_on = 'C'
+    with pytest.raises(KeyboardInterrupt):
+        render_note(make_processor(job_queue=queue), 'A', 'B', 'C')
+    # The jobs were claimed under this process's id, a crashed run leaves them leased by a dead pid
+    queue.postgres_client.execute_query(f"UPDATE {render_queue.QUEUE_TABLE} SET lease_owner = %s "
+                                        "WHERE status = 'in_progress';", params=(dead_worker_id(),), fetch=False)
+
+    backend.crash_on = None
+    start = time.monotonic()
+    _, failed = render_note(make_processor(job_queue=queue), 'A', 'B', 'C')
+
+    assert failed == set()
+    assert time.monotonic() - start < 5
+    assert rendered_texts(3) == ['A', 'B', 'C']
+
+
+def test_relinked_files_are_not_trusted_from_the_queue(queue, make_processor, render_note, rendered_texts):
+    for texts in (['A', 'B'], ['B', 'A'], ['B', 'C'], ['A', 'C']):
+        processor = make_processor(job_queue=queue)
+        render_note(processor, *texts)
+        assert rendered_texts(2) == texts
@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from TTS_gtts import audio_files
+
+
+def test_moved_paragraphs_are_relinked_not_synthesized(make_processor, backend, render_note, rendered_texts):
+    render_note(make_processor(), 'A', 'B', 'C')
+    backend.calls.clear()
+
+    render_note(make_processor(), 'N', 'A', 'B', 'C')
+
+    assert backend.calls == ['N']
+    assert rendered_texts(4) == ['N', 'A', 'B', 'C']
+
+
+def test_crash_after_relinking_does_not_move_files_twice(make_processor, backend, render_note, rendered_texts):
+    render_note(make_processor(), 'A', 'B', 'C')
+    backend.crash_on = 'N'
+    with pytest.raises(KeyboardInterrupt):
+        render_note(make_processor(), 'N', 'A', 'B', 'C')
+
+    backend.crash_on = None
+    processor = make_processor()
+    render_note(processor, 'N', 'A', 'B', 'C')
+
+    assert rendered_texts(4) == ['N', 'A', 'B', 'C']
+    assert None not in make_processor().render_state.get('note.md')
+
+
+def test_crash_between_forgetting_and_moving_files(make_processor, render_note, rendered_texts, monkeypatch):
+    render_note(make_processor(), 'A', 'B', 'C')
+
+    def crash(*args):
+        raise KeyboardInterrupt('relink')
+    processor = make_processor()
+    monkeypatch.setattr(processor, '_relink', crash)
+    with pytest.raises(KeyboardInterrupt):
+        render_note(processor, 'C', 'A', 'B')
+
+    render_note(make_processor(), 'C', 'A', 'B')
+    assert rendered_texts(3) == ['C', 'A', 'B']
+
+
+def test_failed_paragraphs_are_retried_next_run(make_processor, backend, render_note, rendered_texts):
+    synthesize = backend.synthesize
+
+    def failing(text, file_path):
+        if text == 'B':
+            raise RuntimeError('engine down')
+        synthesize(text, file_path)
+    backend.synthesize = failing
+    _, failed = render_note(make_processor(), 'A', 'B')
+    assert failed == {'note.md'}
+    assert make_processor().render_state.get('note.md')[1] is None
+
+    backend.synthesize = synthesize
+    backend.calls.clear()
+    render_note(make_processor(), 'A', 'B')
+    assert backend.calls == ['B']
+    assert rendered_texts(2) == ['A', 'B']
+
+
+def test_rerendered_paragraphs_update_the_render_state(make_processor, backend, render_note, rendered_texts):
+    render_note(make_processor(), 'A', 'B', 'C')
+    # The note was edited to X, A, B, C but not rendered yet, only its first paragraph is re-rendered
+    make_processor().rerender_paragraphs([('note.md', 1, 'X')])
+    assert rendered_texts(1) == ['X']
+
+    backend.calls.clear()
+    render_note(make_processor(), 'X', 'A', 'B', 'C')
+
+    assert backend.calls == ['A']
+    assert rendered_texts(4) == ['X', 'A', 'B', 'C']
+
+
+def test_moved_blank_paragraph_replaces_stale_audio(make_processor, backend, render_note, rendered_texts, output_dir):
+    render_note(make_processor(), 'A', '', 'X')
+    backend.calls.clear()
+
+    render_note(make_processor(), 'A', 'B', '')
+
+    assert backend.calls == ['B']
+    assert rendered_texts(2) == ['A', 'B']
+    assert not (output_dir / 'note.md_3.mp3').exists()
+    assert None not in make_processor().render_state.get('note.md')
+
+
+def test_finish_run_only_removes_stale_temporary_files(make_processor, backend, output_dir):
+    processor = make_processor()
+    names = ['Le départ.partie 2.md_1.mp3', 'note.md_1.mp3.part0.mp3', 'note.md_2.mp3.1a2b3c4d.tmp.mp3',
+             'note.md_3.mp3.moving']
+    for name in names:
+        backend.synthesize(name, str(output_dir / name))
+        os.utime(output_dir / name, (0, 0))
+
+    processor.finish_run()
+
+    assert sorted(os.listdir(output_dir)) == ['Le départ.partie 2.md_1.mp3']
+
+
+def test_render_jobs_retries_chunks_on_the_worker_pool(make_processor, backend, output_dir):
+    synthesize = backend.synthesize
+    attempts = {}
+
+    def flaky(text, file_path):
+        attempts[text] = attempts.get(text, 0) + 1
+        if attempts[text] == 1:
+            raise RuntimeError('engine down')
+        synthesize(text, file_path)
+    backend.synthesize = flaky
+    processor = make_processor(max_workers=4, max_retries=1, retry_backoff_seconds=0, max_chunk_chars=30)
+    chunks = ['Première phrase ici.', 'Deuxième phrase là.', 'Troisième phrase.']
+
+    failed = processor.render_jobs([(' '.join(chunks), 'long.mp3'), ('Court.', 'short.mp3')])
+
+    assert failed == []
+    assert attempts == {text: 2 for text in chunks + ['Court.']}
+    # The chunks are stitched into one file and removed
+    assert audio_files.mp3_frames(str(output_dir / 'long.mp3'))[0] == 3 * 40
+    assert audio_files.mp3_frames(str(output_dir / 'short.mp3'))[0] == 40
+    assert sorted(os.listdir(output_dir)) == ['long.mp3', 'short.mp3']
@@ -1,6 +1,12 @@
+{# French full-text index used to select paragraphs to re-render, dbt creates it with the table (also on
+   --full-refresh) and Postgres keeps it up to date as the incremental runs insert rows #}
 {{ 
     config(
-        materialized = 'table' 
+        materialized = 'incremental',
+        incremental_strategy = 'delete+insert',
+        unique_key = 'content_id',
+        on_schema_change = 'append_new_columns',
+        indexes = [{'columns': ["to_tsvector('french', content)"], 'type': 'gin'}]
     ) 
 }}
 
@@ -9,87 +15,47 @@ WITH raw_text AS (
         note_name,
         content_id,
         paragrapge_order,
-        paragraphe_content
+        paragraphe_content,
+        update_date
     FROM {{ ref('paragraphes') }} -- This refers to the source table where paragraphs are stored
+    {% if is_incremental() %}
+    {# Tables built before update_date existed get it through on_schema_change, every row is rebuilt once #}
+    {% set existing_columns = adapter.get_columns_in_relation(this) | map(attribute='name') | list %}
+    {% if 'update_date' in existing_columns %}
+    -- Only the notes re-split since the last build of this model
+    WHERE update_date > (SELECT COALESCE(MAX(update_date), '-infinity') FROM {{ this }})
+    {% endif %}
+    {% endif %}
 ),
 cleaned_text AS (
     SELECT
         note_name,
         content_id,
         paragrapge_order,
-        paragraphe_content,
-        
-        -- Remove curly quotes and replace with straight quotes
-        REPLACE(REPLACE(paragraphe_content, '“', '"'), '”', '"') AS content_step_1,
-
-        -- Replace nested quotes and ensure standard quote usage (for dialogue)
-        REPLACE(
-            REPLACE(REPLACE(REPLACE(paragraphe_content, '“', '"'), '”', '"'), '"""', '«'),
-            '"""', '»'
-        ) AS content_step_2,
-
-        -- Remove excessive asterisks or symbols like "* * *"
-        REPLACE(
-            REPLACE(
-                REPLACE(REPLACE(paragraphe_content, '“', '"'), '”', '"'),
-                '"""', '«'
-            ),
-            '* * *', ''
-        ) AS content_step_3,
-
-        -- Normalize ellipses ("...") by ensuring they are represented consistently
-        REPLACE(
-            REPLACE(
-                REPLACE(
-                    REPLACE(paragraphe_content, '“', '"'), '”', '"'
-                ),
-                '"""', '«'
-            ),
-            '...', '...'
-        ) AS content_step_4,
-
-        -- Remove unnecessary spaces between words or after punctuation
-        REGEXP_REPLACE(
-            REPLACE(
-                REPLACE(
-                    REPLACE(REPLACE(paragraphe_content, '“', '"'), '”', '"'),
-                    '"""', '«'
-                ),
-                '...', '...'
-            ),
-            '\\s+', ' ', 'g'
-        ) AS content_step_5,
-
-        -- Remove underscores
+        update_date,
+        -- Single pass, innermost first:
+        --   curly quotes -> straight quotes, tripled quotes -> «, drop "* * *" separators,
+        --   collapse runs of whitespace, remove underscores
         REPLACE(
             REGEXP_REPLACE(
                 REPLACE(
                     REPLACE(
-                        REPLACE(REPLACE(paragraphe_content, '“', '"'), '”', '"'),
+                        TRANSLATE(paragraphe_content, '“”', '""'),
                         '"""', '«'
                     ),
-                    '...', '...'
+                    '* * *', ''
                 ),
-                '\\s+', ' ', 'g'
+                '\s+', ' ', 'g'
             ),
             '_', ''
-        ) AS content_step_6
+        ) AS cleaned_content
     FROM raw_text
-),
-final_cleaned_text AS (
-    SELECT
-        note_name,
-        content_id,
-        paragrapge_order,
-        paragraphe_content,
-        -- Use proper sentence segmentation, if needed. Example of handling sentence breaks
-        REGEXP_REPLACE(content_step_6, '(\\.|\\?|!)(\\s)', '\\1\\2') AS cleaned_content  -- Ensures punctuation is followed by space
-    FROM cleaned_text
 )
 
 SELECT
     note_name,
     content_id,
     paragrapge_order,
-    cleaned_content AS content
-FROM final_cleaned_text
+    cleaned_content AS content,
+    update_date
+FROM cleaned_text
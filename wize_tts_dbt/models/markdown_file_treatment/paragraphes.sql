@@ -1,10 +1,24 @@
 {{ 
     config(
-        materialized = 'table' 
+        materialized = 'incremental',
+        incremental_strategy = 'delete+insert',
+        unique_key = 'content_id'
     ) 
 }}
 
-WITH paragraphs_extracted AS (
+-- Rebuilt per note: every paragraph of a changed note is deleted and re-inserted,
+-- so paragraphs removed from the note do not linger
+WITH changed_notes AS (
+    SELECT
+        note_name,
+        content_id,
+        content
+    FROM wizetts.note_content
+    {% if is_incremental() %}
+    WHERE content_updated_at > (SELECT COALESCE(MAX(update_date), '-infinity') FROM {{ this }})
+    {% endif %}
+),
+paragraphs_extracted AS (
     SELECT
         nc.note_name,
         nc.content_id,
@@ -12,7 +26,7 @@ WITH paragraphs_extracted AS (
         paragraph AS paragraphe_content,
         position
     FROM
-        wizetts.note_content AS nc,
+        changed_notes AS nc,
         LATERAL REGEXP_SPLIT_TO_TABLE(nc.content, E'\n\n') WITH ORDINALITY AS t(paragraph, position)
 )
 SELECT
@@ -23,4 +37,4 @@ SELECT
     position AS paragraph_position,
     NOW() as update_date
 FROM paragraphs_extracted
-ORDER BY content_id, paragraph_position
\ No newline at end of file
+ORDER BY content_id, paragraph_position